@@ -2,9 +2,14 @@
 Free AI Helper - Using Ollama with Llama2!
 No API keys required - completely free local AI
 """
-import re
 from typing import List, Dict, Optional
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+import hashlib
 import json
+import threading
+import time
 
 # Ollama for local AI
 try:
@@ -14,6 +19,171 @@ except ImportError:
     REQUESTS_AVAILABLE = False
     print("⚠️ Install requests: pip install requests")
 
+# Optional async client for batched Ollama calls
+try:
+    import asyncio
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+# RE2 gives linear-time matching on large/untrusted chapter text;
+# fall back to the stdlib engine when it isn't installed
+try:
+    import re2 as re
+    RE2_AVAILABLE = True
+except ImportError:
+    import re
+    RE2_AVAILABLE = False
+
+# NumPy scores all moods in one vectorized call (pure-Python fallback below)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Aho-Corasick finds every mood/action keyword in a single pass over the text
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+def _in_event_loop() -> bool:
+    """True when called from code running inside an asyncio event loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+# Precompiled patterns (compiled once at import, reused on every call)
+_NAME_PATTERNS = [
+    re.compile(r'(?:My name is|I am|I\'m|They call me)\s+([A-Z][a-z]+)'),
+    re.compile(r'([A-Z][a-z]+)(?:\s+said|\s+thought|\s+walked)'),
+    re.compile(r'"([A-Z][a-z]+)!?"'),
+]
+_JSON_OBJ_RE = re.compile(r'\{[^}]+\}')
+_JSON_ARR_RE = re.compile(r'(?s)\[.*\]')  # inline flag: re2 has no re.DOTALL
+
+# Hair / eye color phrases -> normalized label, checked in priority order
+_HAIR_LABELS = {
+    'silver hair': 'silver hair',
+    'white hair': 'silver hair',
+    'black hair': 'black hair',
+    'blonde': 'blonde hair',
+    'golden hair': 'blonde hair',
+    'red hair': 'red hair',
+    'brown hair': 'brown hair',
+}
+_HAIR_PRIORITY = ['silver hair', 'black hair', 'blonde hair', 'red hair', 'brown hair']
+
+_EYE_LABELS = {
+    'blue eyes': 'blue eyes',
+    'green eyes': 'green eyes',
+    'brown eyes': 'brown eyes',
+    'gray eyes': 'gray eyes',
+    'grey eyes': 'gray eyes',
+}
+_EYE_PRIORITY = ['blue eyes', 'green eyes', 'brown eyes', 'gray eyes']
+
+# Hair, eye and pronoun hits are collected together in one pass over the text
+_TRAIT_RE = re.compile(
+    r'\b(?:(' + '|'.join(_HAIR_LABELS) + r')|(' + '|'.join(_EYE_LABELS) + r')|(he|she|his|her|him)\b)'
+)
+# Static instruction blocks. Each is sent first and kept byte-identical across
+# calls so Ollama can reuse the KV cache for the shared prefix; the variable
+# input always follows it.
+_CHAR_PREFIX = (
+    "Extract the main character information from this text. "
+    "Return ONLY a JSON object with these fields: name, gender, age, hair, eyes, outfit, vibe.\n\n"
+)
+_SCENE_PREFIX = (
+    "Split this chapter into visual scenes for a manhwa/comic. For each scene, provide:\n"
+    "1. The scene text (key moment)\n"
+    "2. Mood (tense/peaceful/exciting/sad/neutral)\n"
+    "3. Action level (high/medium/low)\n\n"
+    "Format as JSON array.\n\n"
+)
+_ENHANCE_PREFIX = (
+    "Enhance this Stable Diffusion prompt for a manhwa/comic panel based on the scene.\n"
+    "Add artistic details, camera angles, lighting, mood. Keep it under 75 words.\n\n"
+)
+
+# JSON schema for scene detection output (Ollama structured outputs)
+_SCENES_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "text": {"type": "string"},
+            "mood": {"type": "string"},
+            "action_level": {"type": "string", "enum": ["high", "medium", "low"]}
+        },
+        "required": ["text", "mood", "action_level"]
+    }
+}
+
+# How much input text each Ollama call sees (sliced once by the public methods)
+CHAR_CONTEXT_CHARS = 1000
+SCENE_CONTEXT_CHARS = 2000
+ENHANCE_CONTEXT_CHARS = 200
+
+# Keep the model resident between calls instead of reloading it
+OLLAMA_KEEP_ALIVE = "30m"
+
+# On-disk response cache so unchanged chapters skip Ollama entirely
+CACHE_DIR = Path(__file__).parent / ".ollama_cache"
+CACHE_TTL = 7 * 24 * 3600  # seconds
+
+# How long a failed health check is trusted before probing Ollama again
+AVAILABILITY_RECHECK = 60  # seconds
+
+# Mood keywords
+_MOOD_KEYWORDS = {
+    'tense': ['danger', 'threat', 'afraid', 'nervous', 'tense', 'worried'],
+    'peaceful': ['calm', 'peaceful', 'serene', 'quiet', 'gentle'],
+    'exciting': ['exciting', 'thrilling', 'adventure', 'rushed', 'fast'],
+    'sad': ['sad', 'tears', 'crying', 'sorrow', 'grief', 'loss'],
+    'happy': ['happy', 'joy', 'smile', 'laugh', 'delight', 'cheerful'],
+    'mysterious': ['mysterious', 'strange', 'unknown', 'shadow', 'hidden']
+}
+
+_ACTION_WORDS = [
+    'fight', 'battle', 'attack', 'run', 'chase', 'strike',
+    'dodge', 'jump', 'rushed', 'sprinted', 'charged'
+]
+
+# Leading word boundary: "running"/"attacked" still count, "trunk" no longer does
+_ACTION_RE = re.compile(r'\b(' + '|'.join(_ACTION_WORDS) + r')')
+
+_ALL_KEYWORDS = {kw for kws in _MOOD_KEYWORDS.values() for kw in kws}
+
+# Mood ids follow _MOOD_KEYWORDS order so argmax breaks ties the same way max() did
+_MOOD_NAMES = list(_MOOD_KEYWORDS)
+_KEYWORD_TO_MOOD_ID = {
+    kw: mood_id
+    for mood_id, mood in enumerate(_MOOD_NAMES)
+    for kw in _MOOD_KEYWORDS[mood]
+}
+
+
+def _build_keyword_automaton():
+    """Build a single automaton over all mood keywords"""
+    if not AHOCORASICK_AVAILABLE:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for kw in _ALL_KEYWORDS:
+        automaton.add_word(kw, kw)
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
 
 class OllamaAI:
     """
@@ -21,16 +191,60 @@ class OllamaAI:
     Completely free local AI - no API keys!
     """
     
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama2"):
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        model: str = "llama2",
+        cache_dir: Optional[Path] = CACHE_DIR
+    ):
         self.base_url = base_url
         self.model = model
-        self.available = self._check_ollama()
-        
-        if self.available:
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        
+        # Health check runs lazily on first use, not at import time
+        self._available = None
+        self._checked_at = 0.0
+        
+        # Pooled keep-alive connections instead of a new socket per request
+        self._session = None
+        if REQUESTS_AVAILABLE:
+            self._session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+    
+    @property
+    def available(self) -> bool:
+        """Whether Ollama is reachable (checked on first use, re-checked after a miss)"""
+        if self._available or (
+            self._available is False and time.time() - self._checked_at < AVAILABILITY_RECHECK
+        ):
+            return self._available
+        
+        first_check = self._available is None
+        self._available = self._check_ollama()
+        self._checked_at = time.time()
+        
+        if self._available:
             print(f"[OK] Ollama connected with model: {self.model}")
-        else:
+            # Load the model in the background so the first real request doesn't pay for it
+            threading.Thread(target=self._warm, daemon=True).start()
+        elif first_check:
             print(f"⚠️ Ollama not available. Install from: https://ollama.ai")
             print(f"   Then run: ollama pull {self.model}")
+        
+        return self._available
+    
+    def _warm(self):
+        """Issue a one-token generation so Ollama loads (and keeps) the model"""
+        try:
+            self._session.post(
+                f"{self.base_url}/api/generate",
+                json=self._payload(" ", 1),
+                timeout=120
+            )
+        except Exception as e:
+            print(f"Ollama warm-up failed: {e}")
     
     def _check_ollama(self) -> bool:
         """Check if Ollama is running"""
@@ -38,28 +252,95 @@ class OllamaAI:
             return False
         
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=2)
+            response = self._session.get(f"{self.base_url}/api/tags", timeout=2)
             return response.status_code == 200
         except:
             return False
     
-    def generate(self, prompt: str, max_tokens: int = 500) -> Optional[str]:
-        """Generate text using Ollama"""
+    def _payload(self, prompt: str, max_tokens: int, format=None) -> Dict:
+        """Build the /api/generate request body"""
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "options": {
+                "num_predict": max_tokens,
+                "temperature": 0.7
+            }
+        }
+        
+        # "json" or a JSON schema constrains the model to valid structured output
+        if format is not None:
+            payload["format"] = format
+        
+        return payload
+    
+    def _cache_path(self, prompt: str, max_tokens: int, format=None) -> Optional[Path]:
+        """Cache file for a (model, prompt, max_tokens, format) request"""
+        if self.cache_dir is None:
+            return None
+        
+        fmt = json.dumps(format, sort_keys=True) if format is not None else ''
+        key = hashlib.blake2b(
+            f"{self.model}|{max_tokens}|{fmt}|{prompt}".encode('utf-8'),
+            digest_size=16
+        ).hexdigest()
+        return self.cache_dir / f"{key}.json"
+    
+    def _cache_get(self, prompt: str, max_tokens: int, format=None) -> Optional[str]:
+        """Return a cached response, if present and fresh"""
+        path = self._cache_path(prompt, max_tokens, format)
+        if path is None:
+            return None
+        
+        try:
+            if time.time() - path.stat().st_mtime > CACHE_TTL:
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)['response']
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def _cache_set(self, prompt: str, max_tokens: int, response: Optional[str], format=None):
+        """Store a successful response"""
+        path = self._cache_path(prompt, max_tokens, format)
+        if path is None or not response:
+            return
+        
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'model': self.model, 'response': response}, f)
+        except OSError as e:
+            print(f"Ollama cache write failed: {e}")
+    
+    def generate(self, prompt: str, max_tokens: int = 500, format=None) -> Optional[str]:
+        """
+        Generate text using Ollama
+        
+        Args:
+            prompt: Prompt text
+            max_tokens: Token limit for the response
+            format: Optional "json" or JSON schema for structured output
+        """
+        cached = self._cache_get(prompt, max_tokens, format)
+        if cached is not None:
+            return cached
+        
+        result = self._generate(prompt, max_tokens, format)
+        self._cache_set(prompt, max_tokens, result, format)
+        return result
+    
+    def _generate(self, prompt: str, max_tokens: int, format=None) -> Optional[str]:
+        """Uncached request to Ollama"""
         if not self.available:
             return None
         
         try:
-            response = requests.post(
+            response = self._session.post(
                 f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "num_predict": max_tokens,
-                        "temperature": 0.7
-                    }
-                },
+                json=self._payload(prompt, max_tokens, format),
                 timeout=30
             )
             
@@ -69,6 +350,145 @@ class OllamaAI:
             print(f"Ollama error: {e}")
         
         return None
+    
+    def generate_json_object(self, prompt: str, max_tokens: int = 500) -> Optional[str]:
+        """
+        Stream a JSON-object response and stop as soon as it is complete
+        
+        Trailing tokens after the closing brace are never generated, which
+        saves decode time when the model keeps talking after the JSON.
+        """
+        cached = self._cache_get(prompt, max_tokens, "json")
+        if cached is not None:
+            return cached
+        
+        if not self.available:
+            return None
+        
+        try:
+            result = self._stream_json_object(prompt, max_tokens)
+        except Exception as e:
+            print(f"Ollama stream error, retrying without streaming: {e}")
+            result = self._generate(prompt, max_tokens, "json")
+        
+        self._cache_set(prompt, max_tokens, result, "json")
+        return result
+    
+    def _stream_json_object(self, prompt: str, max_tokens: int) -> Optional[str]:
+        """Read streamed chunks until the top-level object closes"""
+        payload = self._payload(prompt, max_tokens, "json")
+        payload["stream"] = True
+        
+        buf = []
+        depth = 0
+        started = in_string = escaped = False
+        
+        with self._session.post(
+            f"{self.base_url}/api/generate",
+            json=payload,
+            stream=True,
+            timeout=30
+        ) as response:
+            if response.status_code != 200:
+                return None
+            
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                piece = chunk.get('response', '')
+                
+                for i, ch in enumerate(piece):
+                    if in_string:
+                        if escaped:
+                            escaped = False
+                        elif ch == '\\':
+                            escaped = True
+                        elif ch == '"':
+                            in_string = False
+                    elif ch == '"':
+                        in_string = True
+                    elif ch == '{':
+                        depth += 1
+                        started = True
+                    elif ch == '}':
+                        depth -= 1
+                        if started and depth == 0:
+                            # Object complete - drop the connection to stop decoding
+                            buf.append(piece[:i + 1])
+                            text = ''.join(buf)
+                            return text[text.index('{'):]
+                
+                buf.append(piece)
+                if chunk.get('done'):
+                    break
+        
+        return ''.join(buf).strip() or None
+    
+    def generate_many(
+        self,
+        prompts: List[str],
+        max_tokens: int = 500,
+        concurrency: int = 4
+    ) -> List[Optional[str]]:
+        """
+        Generate text for several prompts concurrently
+        
+        Args:
+            prompts: Prompts to send
+            max_tokens: Token limit per response
+            concurrency: Maximum requests in flight at once
+            
+        Returns:
+            Responses in the same order as prompts (None for failures)
+        """
+        results = [self._cache_get(p, max_tokens) for p in prompts]
+        missing = [i for i, r in enumerate(results) if r is None]
+        
+        if not self.available or not missing:
+            return results
+        
+        todo = [prompts[i] for i in missing]
+        # asyncio.run() can't nest inside a running event loop, so decide
+        # before building the coroutine; per-prompt errors are handled in
+        # _agenerate, anything else propagates rather than re-running the batch
+        if AIOHTTP_AVAILABLE and not _in_event_loop():
+            fresh = asyncio.run(self._gather(todo, max_tokens, concurrency))
+        else:
+            fresh = [self._generate(p, max_tokens) for p in todo]
+        
+        for i, response in zip(missing, fresh):
+            results[i] = response
+            self._cache_set(prompts[i], max_tokens, response)
+        
+        return results
+    
+    async def _gather(self, prompts: List[str], max_tokens: int, concurrency: int) -> List[Optional[str]]:
+        """Run all prompts over a single pooled session"""
+        semaphore = asyncio.Semaphore(concurrency)
+        timeout = aiohttp.ClientTimeout(total=30)
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            return await asyncio.gather(
+                *(self._agenerate(session, semaphore, p, max_tokens) for p in prompts)
+            )
+    
+    async def _agenerate(self, session, semaphore, prompt: str, max_tokens: int) -> Optional[str]:
+        """Async counterpart of generate()"""
+        async with semaphore:
+            try:
+                async with session.post(
+                    f"{self.base_url}/api/generate",
+                    json=self._payload(prompt, max_tokens)
+                ) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        return data.get('response', '').strip()
+            except Exception as e:
+                print(f"Ollama error: {e}")
+        
+        return None
 
 
 class FreeAIHelper:
@@ -78,6 +498,11 @@ class FreeAIHelper:
     
     def __init__(self):
         self.ollama = OllamaAI()
+        
+        # Rule-based analysis is deterministic in its input, so repeated runs
+        # over the same chapter are answered from memory
+        self._character_cache = lru_cache(maxsize=64)(self._extract_character_rule_based)
+        self._scenes_cache = lru_cache(maxsize=64)(self._analyze_scenes_rule_based)
     
     def is_available(self) -> bool:
         """Always returns True - rule-based processing always works"""
@@ -95,11 +520,15 @@ class FreeAIHelper:
         """
         # Try Ollama first for smarter extraction
         if self.ollama.available:
-            ollama_result = self._extract_character_with_ollama(text)
+            ollama_result = self._extract_character_with_ollama(text[:CHAR_CONTEXT_CHARS])
             if ollama_result:
                 return ollama_result
         
-        # Fallback to rule-based extraction
+        # Fallback to rule-based extraction (copied so callers can't mutate the cache)
+        return dict(self._character_cache(text))
+    
+    def _extract_character_rule_based(self, text: str) -> Dict:
+        """Pattern-matching character extraction"""
         character_info = {
             'name': 'protagonist',
             'gender': 'unknown',
@@ -111,45 +540,25 @@ class FreeAIHelper:
         }
         
         # Try to extract name from common patterns
-        name_patterns = [
-            r'(?:My name is|I am|I\'m|They call me)\s+([A-Z][a-z]+)',
-            r'([A-Z][a-z]+)(?:\s+said|\s+thought|\s+walked)',
-            r'"([A-Z][a-z]+)!?"',
-        ]
-        
-        for pattern in name_patterns:
-            match = re.search(pattern, text)
+        for pattern in _NAME_PATTERNS:
+            match = pattern.search(text)
             if match:
                 character_info['name'] = match.group(1)
                 break
         
-        # Extract physical descriptions
-        if 'silver hair' in text.lower() or 'white hair' in text.lower():
-            character_info['hair'] = 'silver hair'
-        elif 'black hair' in text.lower():
-            character_info['hair'] = 'black hair'
-        elif 'blonde' in text.lower() or 'golden hair' in text.lower():
-            character_info['hair'] = 'blonde hair'
-        elif 'red hair' in text.lower():
-            character_info['hair'] = 'red hair'
-        elif 'brown hair' in text.lower():
-            character_info['hair'] = 'brown hair'
+        # Single scan for hair, eye and pronoun hints
+        hair_found, eyes_found, pronouns = self._scan_traits(text.lower())
+        
+        # Extract physical descriptions (ladder order decides ties)
+        character_info['hair'] = next((h for h in _HAIR_PRIORITY if h in hair_found), '')
         
         # Extract eye color
-        if 'blue eyes' in text.lower():
-            character_info['eyes'] = 'blue eyes'
-        elif 'green eyes' in text.lower():
-            character_info['eyes'] = 'green eyes'
-        elif 'brown eyes' in text.lower():
-            character_info['eyes'] = 'brown eyes'
-        elif 'gray eyes' in text.lower() or 'grey eyes' in text.lower():
-            character_info['eyes'] = 'gray eyes'
+        character_info['eyes'] = next((e for e in _EYE_PRIORITY if e in eyes_found), '')
         
         # Extract gender hints
-        pronouns = re.findall(r'\b(he|she|his|her|him)\b', text.lower())
         if pronouns:
-            male_count = sum(1 for p in pronouns if p in ['he', 'his', 'him'])
-            female_count = sum(1 for p in pronouns if p in ['she', 'her'])
+            male_count = pronouns['he'] + pronouns['his'] + pronouns['him']
+            female_count = pronouns['she'] + pronouns['her']
             if male_count > female_count:
                 character_info['gender'] = 'male'
             elif female_count > male_count:
@@ -157,26 +566,27 @@ class FreeAIHelper:
         
         return character_info
     
-    def _extract_character_with_ollama(self, text: str) -> Optional[Dict]:
-        """Use Ollama to extract character info"""
-        prompt = f"""Extract the main character information from this text. Return ONLY a JSON object with these fields: name, gender, age, hair, eyes, outfit, vibe.
-
-Text: {text[:1000]}
-
-JSON:"""
-        
-        response = self.ollama.generate(prompt, max_tokens=200)
-        
-        if response:
-            try:
-                # Try to parse JSON from response
-                json_match = re.search(r'\{[^}]+\}', response)
-                if json_match:
-                    return json.loads(json_match.group())
-            except:
-                pass
+    def _scan_traits(self, text_lower: str):
+        """Collect hair colors, eye colors and pronoun counts in one pass"""
+        hair_found, eyes_found, pronouns = set(), set(), Counter()
+        
+        for hair, eyes, pronoun in _TRAIT_RE.findall(text_lower):
+            if hair:
+                hair_found.add(_HAIR_LABELS[hair])
+            elif eyes:
+                eyes_found.add(_EYE_LABELS[eyes])
+            else:
+                pronouns[pronoun] += 1
+        
+        return hair_found, eyes_found, pronouns
+    
+    def _extract_character_with_ollama(self, text_head: str) -> Optional[Dict]:
+        """Use Ollama to extract character info (text already truncated)"""
+        prompt = f"{_CHAR_PREFIX}Text: {text_head}\n\nJSON:"
         
-        return None
+        response = self.ollama.generate_json_object(prompt, max_tokens=200)
+        result = self._parse_json(response, _JSON_OBJ_RE)
+        return result if isinstance(result, dict) else None
     
     def analyze_chapter_scenes(self, text: str, max_scenes: int = 15) -> List[Dict]:
         """
@@ -191,11 +601,15 @@ JSON:"""
         """
         # Try Ollama first for intelligent scene detection
         if self.ollama.available:
-            ollama_scenes = self._analyze_scenes_with_ollama(text, max_scenes)
+            ollama_scenes = self._analyze_scenes_with_ollama(text[:SCENE_CONTEXT_CHARS], max_scenes)
             if ollama_scenes:
                 return ollama_scenes
         
-        # Fallback to rule-based splitting
+        # Fallback to rule-based splitting (copied so callers can't mutate the cache)
+        return [dict(scene) for scene in self._scenes_cache(text, max_scenes)]
+    
+    def _analyze_scenes_rule_based(self, text: str, max_scenes: int) -> List[Dict]:
+        """Paragraph-based scene splitting with keyword metadata"""
         scenes = []
         
         # Split by paragraph breaks (common scene boundaries)
@@ -214,11 +628,7 @@ JSON:"""
             if is_boundary and current_scene:
                 # Save current scene
                 scene_text = ' '.join(current_scene)
-                scenes.append({
-                    'text': scene_text,
-                    'mood': self._detect_mood(scene_text),
-                    'action_level': self._detect_action(scene_text)
-                })
+                scenes.append({'text': scene_text, **self._scan_scene(scene_text.lower())})
                 current_scene = []
                 
                 if len(scenes) >= max_scenes:
@@ -229,72 +639,64 @@ JSON:"""
         # Add final scene
         if current_scene and len(scenes) < max_scenes:
             scene_text = ' '.join(current_scene)
-            scenes.append({
-                'text': scene_text,
-                'mood': self._detect_mood(scene_text),
-                'action_level': self._detect_action(scene_text)
-            })
+            scenes.append({'text': scene_text, **self._scan_scene(scene_text.lower())})
         
         return scenes
     
-    def _analyze_scenes_with_ollama(self, text: str, max_scenes: int) -> Optional[List[Dict]]:
-        """Use Ollama to intelligently split scenes"""
-        prompt = f"""Split this chapter into {max_scenes} visual scenes for a manhwa/comic. For each scene, provide:
-1. The scene text (key moment)
-2. Mood (tense/peaceful/exciting/sad/neutral)
-3. Action level (high/medium/low)
-
-Format as JSON array.
-
-Chapter: {text[:2000]}
-
-JSON:"""
+    def _analyze_scenes_with_ollama(self, text_head: str, max_scenes: int) -> Optional[List[Dict]]:
+        """Use Ollama to intelligently split scenes (text already truncated)"""
+        prompt = f"{_SCENE_PREFIX}Number of scenes: {max_scenes}\n\nChapter: {text_head}\n\nJSON:"
         
-        response = self.ollama.generate(prompt, max_tokens=1000)
+        response = self.ollama.generate(prompt, max_tokens=1000, format=_SCENES_SCHEMA)
+        result = self._parse_json(response, _JSON_ARR_RE)
+        return result if isinstance(result, list) else None
+    
+    def _parse_json(self, response: Optional[str], fallback_re):
+        """
+        Parse a structured-output response
         
-        if response:
-            try:
-                # Try to extract JSON array
-                json_match = re.search(r'\[.*\]', response, re.DOTALL)
-                if json_match:
-                    return json.loads(json_match.group())
-            except:
-                pass
+        Output requested with a format is already valid JSON; the regex
+        fallback only covers older Ollama servers that ignore the format.
+        """
+        if not response:
+            return None
         
-        return None
-    
-    def _detect_mood(self, text: str) -> str:
-        """Detect mood from text using keyword matching"""
-        text_lower = text.lower()
-        
-        # Mood keywords
-        moods = {
-            'tense': ['danger', 'threat', 'afraid', 'nervous', 'tense', 'worried'],
-            'peaceful': ['calm', 'peaceful', 'serene', 'quiet', 'gentle'],
-            'exciting': ['exciting', 'thrilling', 'adventure', 'rushed', 'fast'],
-            'sad': ['sad', 'tears', 'crying', 'sorrow', 'grief', 'loss'],
-            'happy': ['happy', 'joy', 'smile', 'laugh', 'delight', 'cheerful'],
-            'mysterious': ['mysterious', 'strange', 'unknown', 'shadow', 'hidden']
-        }
+        try:
+            return json.loads(response)
+        except ValueError:
+            pass
         
-        mood_scores = {}
-        for mood, keywords in moods.items():
-            score = sum(1 for kw in keywords if kw in text_lower)
-            if score > 0:
-                mood_scores[mood] = score
+        try:
+            json_match = fallback_re.search(response)
+            if json_match:
+                return json.loads(json_match.group())
+        except ValueError:
+            pass
         
-        return max(mood_scores, key=mood_scores.get) if mood_scores else 'neutral'
+        return None
     
-    def _detect_action(self, text: str) -> str:
-        """Detect action level from text"""
-        text_lower = text.lower()
-        
-        action_words = [
-            'fight', 'battle', 'attack', 'run', 'chase', 'strike',
-            'dodge', 'jump', 'rushed', 'sprinted', 'charged'
-        ]
+    def _keyword_hits(self, text_lower: str) -> set:
+        """Collect the distinct mood keywords present in the text"""
+        if _KEYWORD_AUTOMATON is not None:
+            return {kw for _, kw in _KEYWORD_AUTOMATON.iter(text_lower)}
         
-        action_count = sum(1 for word in action_words if word in text_lower)
+        return {kw for kw in _ALL_KEYWORDS if kw in text_lower}
+    
+    def _scan_scene(self, text_lower: str) -> Dict:
+        """Detect mood and action level for a scene"""
+        return {
+            'mood': self._detect_mood(text_lower),
+            'action_level': self._detect_action(text_lower)
+        }
+    
+    def _detect_mood(self, text_lower: str) -> str:
+        """Detect mood from lowercased text using keyword matching"""
+        return self._mood_from_hits(self._keyword_hits(text_lower))
+    
+    def _detect_action(self, text_lower: str) -> str:
+        """Detect action level from lowercased text"""
+        # Distinct action words, so thresholds mean the same as before
+        action_count = len(set(_ACTION_RE.findall(text_lower)))
         
         if action_count >= 3:
             return 'high'
@@ -303,6 +705,23 @@ JSON:"""
         else:
             return 'low'
     
+    def _mood_from_hits(self, hits: set) -> str:
+        """Pick the mood with the most keyword hits"""
+        if NUMPY_AVAILABLE:
+            mood_ids = [_KEYWORD_TO_MOOD_ID[kw] for kw in hits if kw in _KEYWORD_TO_MOOD_ID]
+            if not mood_ids:
+                return 'neutral'
+            counts = np.bincount(mood_ids, minlength=len(_MOOD_NAMES))
+            return _MOOD_NAMES[int(counts.argmax())]
+        
+        mood_scores = {}
+        for mood, keywords in _MOOD_KEYWORDS.items():
+            score = sum(1 for kw in keywords if kw in hits)
+            if score > 0:
+                mood_scores[mood] = score
+        
+        return max(mood_scores, key=mood_scores.get) if mood_scores else 'neutral'
+    
     def enhance_prompt(self, base_prompt: str, scene_text: str = "") -> str:
         """
         Enhance image generation prompt with Ollama AI + quality tags
@@ -316,11 +735,41 @@ JSON:"""
         """
         # Try Ollama for intelligent enhancement
         if self.ollama.available and scene_text:
-            ollama_enhanced = self._enhance_prompt_with_ollama(base_prompt, scene_text)
+            ollama_enhanced = self._enhance_prompt_with_ollama(base_prompt, scene_text[:ENHANCE_CONTEXT_CHARS])
             if ollama_enhanced:
                 return ollama_enhanced
         
-        # Fallback to rule-based enhancement
+        return self._enhance_prompt_rule_based(base_prompt, scene_text)
+    
+    def enhance_prompts(self, base_prompt: str, scene_texts: List[str]) -> List[str]:
+        """
+        Enhance one prompt per scene, batching the Ollama calls
+        
+        Args:
+            base_prompt: Base prompt shared by all scenes
+            scene_texts: Scene texts for context
+            
+        Returns:
+            Enhanced prompts in scene order
+        """
+        responses = [None] * len(scene_texts)
+        
+        if self.ollama.available:
+            pending = [i for i, t in enumerate(scene_texts) if t]
+            batch = self.ollama.generate_many(
+                [self._build_enhance_prompt(base_prompt, scene_texts[i][:ENHANCE_CONTEXT_CHARS]) for i in pending],
+                max_tokens=150
+            )
+            for i, response in zip(pending, batch):
+                responses[i] = self._clean_enhanced(response)
+        
+        return [
+            enhanced or self._enhance_prompt_rule_based(base_prompt, text)
+            for enhanced, text in zip(responses, scene_texts)
+        ]
+    
+    def _enhance_prompt_rule_based(self, base_prompt: str, scene_text: str) -> str:
+        """Rule-based fallback enhancement"""
         quality_tags = [
             "highly detailed",
             "professional digital art",
@@ -330,9 +779,10 @@ JSON:"""
         
         # Detect if dialogue/action scene
         if scene_text:
-            if any(word in scene_text.lower() for word in ['said', 'asked', 'shouted', '"']):
+            scene_lower = scene_text.lower()
+            if any(word in scene_lower for word in ['said', 'asked', 'shouted', '"']):
                 quality_tags.append("expressive face")
-            if any(word in scene_text.lower() for word in ['fight', 'battle', 'run']):
+            if any(word in scene_lower for word in ['fight', 'battle', 'run']):
                 quality_tags.append("dynamic action pose")
         
         enhanced = f"{base_prompt}, {', '.join(quality_tags)}"
@@ -341,16 +791,16 @@ JSON:"""
     
     def _enhance_prompt_with_ollama(self, base_prompt: str, scene_text: str) -> Optional[str]:
         """Use Ollama to enhance image prompt"""
-        prompt = f"""Enhance this Stable Diffusion prompt for a manhwa/comic panel based on the scene.
-Add artistic details, camera angles, lighting, mood. Keep it under 75 words.
-
-Scene: {scene_text[:200]}
-Base prompt: {base_prompt}
-
-Enhanced prompt:"""
-        
+        prompt = self._build_enhance_prompt(base_prompt, scene_text)
         response = self.ollama.generate(prompt, max_tokens=150)
-        
+        return self._clean_enhanced(response)
+    
+    def _build_enhance_prompt(self, base_prompt: str, scene_head: str) -> str:
+        """Build the Ollama prompt for prompt enhancement (scene already truncated)"""
+        return f"{_ENHANCE_PREFIX}Scene: {scene_head}\nBase prompt: {base_prompt}\n\nEnhanced prompt:"
+    
+    def _clean_enhanced(self, response: Optional[str]) -> Optional[str]:
+        """Validate and clean up an enhancement response"""
         if response and len(response) < 500:
             # Clean up the response
             enhanced = response.strip().strip('"\'')
@@ -1,32 +1,32 @@
-import requests
-import time
+import asyncio
 import sys
-import json
+
+import httpx
 
 BASE_URL = "http://localhost:5000"
 
 def log(msg):
     print(f"[TEST] {msg}")
 
-def wait_for_server():
+async def wait_for_server(client):
     log("Waiting for server to start...")
-    for i in range(10):
+    for i in range(200):  # Poll every 100ms for up to 20 seconds
         try:
-            response = requests.get(f"{BASE_URL}/health")
+            response = await client.get(f"{BASE_URL}/health", timeout=0.5)
             if response.status_code == 200:
                 log("Server is up!")
                 return True
-        except requests.exceptions.ConnectionError:
+        except httpx.TransportError:
             pass
-        time.sleep(2)
+        await asyncio.sleep(0.1)
     log("Server failed to start or is not reachable.")
     return False
 
-def test_create_project():
+async def test_create_project(client):
     log("Testing Create Project...")
     payload = {"title": "Test Project"}
     try:
-        response = requests.post(f"{BASE_URL}/api/projects", json=payload)
+        response = await client.post(f"{BASE_URL}/api/projects", json=payload)
         if response.status_code == 200:
             data = response.json()
             if data.get("success"):
@@ -41,7 +41,7 @@ def test_create_project():
         log(f"Exception creating project: {e}")
     return None
 
-def test_create_character():
+async def test_create_character(client):
     log("Testing Create Character...")
     payload = {
         "name": "Test Char",
@@ -52,7 +52,7 @@ def test_create_character():
         "default_outfit": "casual"
     }
     try:
-        response = requests.post(f"{BASE_URL}/api/characters", json=payload)
+        response = await client.post(f"{BASE_URL}/api/characters", json=payload)
         if response.status_code == 200:
             data = response.json()
             if data.get("success"):
@@ -67,7 +67,7 @@ def test_create_character():
         log(f"Exception creating character: {e}")
     return None
 
-def test_generation(project_id):
+async def test_generation(client, project_id):
     log("Testing Generation Start...")
     payload = {
         "chapter_text": "Elena stood at the cliff edge. The wind blew through her hair.",
@@ -77,7 +77,7 @@ def test_generation(project_id):
         "max_panels": 1
     }
     try:
-        response = requests.post(f"{BASE_URL}/api/generate", json=payload)
+        response = await client.post(f"{BASE_URL}/api/generate", json=payload)
         if response.status_code == 200:
             data = response.json()
             if data.get("success"):
@@ -93,17 +93,17 @@ def test_generation(project_id):
         log(f"Exception starting generation: {e}")
     return None
 
-def check_progress(job_id):
+async def check_progress(client, job_id):
     log(f"Checking progress for job {job_id}...")
     for i in range(30): # Wait up to 60 seconds
         try:
-            response = requests.get(f"{BASE_URL}/api/progress/{job_id}")
+            response = await client.get(f"{BASE_URL}/api/progress/{job_id}")
             if response.status_code == 200:
                 data = response.json()
                 status = data.get("status")
                 progress = data.get("progress")
                 log(f"Status: {status}, Progress: {progress}%")
-                
+
                 if status == "completed":
                     log("Generation completed successfully!")
                     return True
@@ -114,23 +114,31 @@ def check_progress(job_id):
                 log(f"Failed to get progress. Status: {response.status_code}")
         except Exception as e:
             log(f"Exception checking progress: {e}")
-        time.sleep(2)
+        await asyncio.sleep(2)
     log("Timed out waiting for generation.")
     return False
 
+async def run():
+    # One shared client so every probe reuses the same connection pool
+    async with httpx.AsyncClient(timeout=10) as client:
+        if not await wait_for_server(client):
+            return 1
+
+        # Independent setup probes run concurrently
+        project_id, char_id = await asyncio.gather(
+            test_create_project(client),
+            test_create_character(client)
+        )
+        if not project_id:
+            return 1
+
+        job_id = await test_generation(client, project_id)
+        if job_id:
+            await check_progress(client, job_id)
+    return 0
+
 def main():
-    if not wait_for_server():
-        sys.exit(1)
-    
-    project_id = test_create_project()
-    if not project_id:
-        sys.exit(1)
-        
-    char_id = test_create_character()
-    
-    job_id = test_generation(project_id)
-    if job_id:
-        check_progress(job_id)
+    sys.exit(asyncio.run(run()))
 
 if __name__ == "__main__":
     main()
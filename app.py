@@ -1,19 +1,31 @@
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Request, render_template, request, jsonify, send_file
 from flask_cors import CORS
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import HTTPException
 from pathlib import Path
 import os
+import io
 import uuid
 import json
 from datetime import datetime
 import threading
-import shutil
+import queue
 import logging
 from functools import wraps
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 import time
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Import generator modules
-from config import create_directories, OUTPUT_DIR, FRAMES_DIR
+import config
+from config import create_directories, get_model_path, OUTPUT_DIR, FRAMES_DIR
 from text_processor import ChapterParser
 from character_manager import character_library, CharacterProfile
 from prompt_builder import PromptBuilder
@@ -22,6 +34,28 @@ from post_processor import PostProcessor
 from bundler import Bundler
 from project_manager import project_manager
 from panel_editor import PanelEditor
+from prompt_cache import prompt_cache, cache_key
+
+# Optional components (features degrade gracefully when missing)
+try:
+    from ai_helper import ai_helper
+except ImportError:
+    ai_helper = None
+
+try:
+    from styles import style_manager
+except ImportError:
+    style_manager = None
+
+try:
+    from upscaler import upscale_files
+except ImportError:
+    upscale_files = None
+
+try:
+    from exporter import exporter
+except ImportError:
+    exporter = None
 
 # ============================================================================
 # LOGGING SETUP
@@ -41,6 +75,24 @@ logger = logging.getLogger(__name__)
 # ============================================================================
 app = Flask(__name__)
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """orjson-backed JSON for jsonify() and request.get_json()"""
+    
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        # Types orjson doesn't know fall back to Flask's default handler
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
+
 # Load secret key from environment
 app.secret_key = os.getenv('SECRET_KEY', 'change-this-in-production-to-random-string')
 if app.secret_key == 'change-this-in-production-to-random-string':
@@ -62,46 +114,102 @@ create_directories()
 UPLOAD_FOLDER = Path('uploads')
 UPLOAD_FOLDER.mkdir(exist_ok=True)
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max upload
+MAX_JSON_BODY = 2 * 1024 * 1024  # JSON requests only carry text (chapters <= 50k chars)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+
+class LimitedRequest(Request):
+    """
+    Request with a tighter body limit for JSON
+    
+    Werkzeug applies max_content_length to the input stream itself, so the
+    limit also holds for chunked bodies that arrive without Content-Length
+    (declared sizes are rejected up front by limit_json_body).
+    """
+    
+    @property
+    def max_content_length(self):
+        if self.is_json:
+            return MAX_JSON_BODY
+        return super().max_content_length
+
+
+app.request_class = LimitedRequest
+
+# Behind nginx/Apache, let the front server stream files (X-Sendfile)
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+
 # Store generation jobs (in production, use Redis or database)
-generation_jobs = {}
 MAX_JOBS = 100  # Limit stored jobs
+JOB_TTL = 24 * 3600  # Finished jobs (and stale uploads) are swept after this
+JOB_SWEEP_INTERVAL = 600  # seconds
 
 # Rate limiting (simple in-memory, use Redis in production)
-request_counts = {}
+# Token bucket per client: ip -> (tokens, last_refill_time)
+rate_buckets = {}
+rate_buckets_lock = threading.Lock()
 RATE_LIMIT = int(os.getenv('RATE_LIMIT', '10'))  # requests per minute
 RATE_WINDOW = 60  # seconds
+RATE_PRUNE_EVERY = 10000  # requests between sweeps of idle buckets
+_rate_requests_seen = 0
+
+# Warm generator shared by all jobs; weights are only reloaded when a job asks
+# for a different model. Holding the lock also serializes GPU work.
+MODEL_IDS = {
+    'sd15': config.MODEL_ID,
+    'sdxl': 'stabilityai/stable-diffusion-xl-base-1.0'
+}
+_pipeline_cache = {'model_id': None, 'generator': None, 'warmed': set(), 'lock': threading.Lock()}
+
+# Pending generation jobs, consumed by a single worker thread
+MAX_QUEUED_JOBS = 16
+_job_queue = queue.Queue(maxsize=MAX_QUEUED_JOBS)
 
 # ============================================================================
 # SECURITY & VALIDATION
 # ============================================================================
 
 def rate_limit(f):
-    """Simple rate limiting decorator"""
+    """Simple rate limiting decorator (O(1) token bucket per client)"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
+        global _rate_requests_seen
         client_ip = request.remote_addr
         current_time = time.time()
+        refill_rate = RATE_LIMIT / RATE_WINDOW  # tokens per second
         
-        # Clean old entries
-        request_counts[client_ip] = [
-            req_time for req_time in request_counts.get(client_ip, [])
-            if current_time - req_time < RATE_WINDOW
-        ]
-        
-        # Check rate limit
-        if len(request_counts.get(client_ip, [])) >= RATE_LIMIT:
-            logger.warning(f"Rate limit exceeded for {client_ip}")
-            return jsonify({'error': 'Rate limit exceeded. Try again later.'}), 429
-        
-        # Add current request
-        request_counts.setdefault(client_ip, []).append(current_time)
+        with rate_buckets_lock:
+            tokens, last = rate_buckets.get(client_ip, (RATE_LIMIT, current_time))
+            tokens = min(RATE_LIMIT, tokens + (current_time - last) * refill_rate)
+            
+            # Check rate limit
+            if tokens < 1:
+                rate_buckets[client_ip] = (tokens, current_time)
+                logger.warning(f"Rate limit exceeded for {client_ip}")
+                return jsonify({'error': 'Rate limit exceeded. Try again later.'}), 429
+            
+            # Consume a token for this request
+            rate_buckets[client_ip] = (tokens - 1, current_time)
+            
+            # Periodically drop buckets of clients that have gone idle
+            _rate_requests_seen += 1
+            if _rate_requests_seen >= RATE_PRUNE_EVERY:
+                _rate_requests_seen = 0
+                for ip in [ip for ip, (_, seen) in rate_buckets.items()
+                           if current_time - seen > RATE_WINDOW * 10]:
+                    del rate_buckets[ip]
         
         return f(*args, **kwargs)
     return decorated_function
 
 
+@app.before_request
+def limit_json_body():
+    """Reject JSON bodies that declare an oversized Content-Length before the view runs"""
+    if request.is_json and request.content_length and request.content_length > MAX_JSON_BODY:
+        return jsonify({'error': f'Request too large (max {MAX_JSON_BODY // (1024 * 1024)}MB)'}), 413
+
+
 def validate_text_input(text, max_length=50000):
     """Validate and sanitize text input"""
     if not text or not isinstance(text, str):
@@ -153,6 +261,8 @@ class GenerationJob:
         self.generated_panels = 0
         self.error = None
         self.output_path = None
+        self.panel_paths = []  # Filled once, after generation/upscaling
+        self.panel_names = frozenset()
         self.started_at = datetime.now()
         self.completed_at = None
     
@@ -171,13 +281,167 @@ class GenerationJob:
         }
 
 
+class JobStore:
+    """
+    Thread-safe, size-bounded job registry (LRU order)
+    
+    Only finished jobs are evicted, either when the store is over maxsize or
+    once they have been done for longer than ttl seconds.
+    """
+    
+    def __init__(self, maxsize=MAX_JOBS, ttl=JOB_TTL):
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.maxsize = maxsize
+        self.ttl = ttl
+    
+    @staticmethod
+    def _finished(job):
+        return job.status in ('completed', 'failed')
+    
+    def add(self, job):
+        """Register a job, evicting the least recently used finished jobs"""
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._jobs.move_to_end(job.job_id)
+            
+            excess = len(self._jobs) - self.maxsize
+            if excess > 0:
+                stale = [jid for jid, j in self._jobs.items() if self._finished(j)]
+                for jid in stale[:excess]:
+                    del self._jobs[jid]
+    
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._jobs.move_to_end(job_id)
+            return job
+    
+    def pop(self, job_id):
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+    
+    def values(self):
+        with self._lock:
+            return list(self._jobs.values())
+    
+    def sweep(self):
+        """Drop finished jobs older than ttl; returns how many were removed"""
+        cutoff = datetime.now().timestamp() - self.ttl
+        with self._lock:
+            expired = [
+                jid for jid, j in self._jobs.items()
+                if self._finished(j) and j.completed_at and j.completed_at.timestamp() < cutoff
+            ]
+            for jid in expired:
+                del self._jobs[jid]
+        return len(expired)
+
+
+generation_jobs = JobStore()
+
+
+def _sweep_stale_files(cutoff):
+    """Remove leftover uploads and interrupted temp panels older than cutoff"""
+    candidates = list(UPLOAD_FOLDER.glob('*')) + list(FRAMES_DIR.glob('*.tmp'))
+    for path in candidates:
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError as e:
+            logger.warning(f"Could not remove {path}: {e}")
+
+
+def _job_sweeper():
+    """Periodically expire old jobs and reclaim disk"""
+    while True:
+        time.sleep(JOB_SWEEP_INTERVAL)
+        try:
+            removed = generation_jobs.sweep()
+            if removed:
+                logger.info(f"Swept {removed} expired jobs")
+            _sweep_stale_files(time.time() - JOB_TTL)
+        except Exception as e:
+            logger.warning(f"Job sweep failed: {e}")
+
+
+threading.Thread(target=_job_sweeper, name='job-sweeper', daemon=True).start()
+
+
 # ============================================================================
 # GENERATION WORKER
 # ============================================================================
 
+def save_png(image, path):
+    """
+    PNG encode tuned for speed (optimize=True re-runs the filter search)
+    
+    Encodes into memory first so the file is written with one write call
+    instead of PIL's many small chunked writes.
+    """
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", optimize=False, compress_level=3)
+    with open(path, 'wb') as f:
+        f.write(buffer.getbuffer())
+
+
+def get_shared_generator(model_id, draft_mode, compile=True, max_batch=None):
+    """
+    Return (generator, batch_size) for model_id, loading weights only if needed
+    
+    Caller must hold _pipeline_cache['lock'].
+    """
+    generator = _pipeline_cache['generator']
+    
+    if generator is not None and _pipeline_cache['model_id'] == model_id:
+        generator.set_mode(draft_mode)
+    else:
+        if generator is not None:
+            logger.info(f"Switching model {_pipeline_cache['model_id']} -> {model_id}")
+            _pipeline_cache.update(model_id=None, generator=None, warmed=set())
+            generator.unload()
+        
+        generator = ManhwaGenerator(draft_mode=draft_mode)
+        generator.load_pipeline(compile=compile)
+        _pipeline_cache.update(model_id=model_id, generator=generator)
+    
+    # Warm each output shape once (compiled graphs are shape-specific)
+    batch_size = min(generator.batch_size, max_batch or generator.batch_size)
+    shape = (generator.width, generator.height, batch_size)
+    if shape not in _pipeline_cache['warmed']:
+        generator.warmup(batch_size=batch_size)
+        _pipeline_cache['warmed'].add(shape)
+    
+    return generator, batch_size
+
+
+def prewarm_pipeline():
+    """
+    Load and warm the default model before the first job arrives
+    
+    Runs in the background at startup; jobs that arrive meanwhile simply
+    wait on the pipeline lock instead of loading their own copy.
+    """
+    if config.get_device() != 'cuda':
+        logger.info("Skipping pipeline pre-warm (no CUDA device)")
+        return
+    
+    try:
+        with _pipeline_cache['lock']:
+            config.MODEL_ID = MODEL_IDS['sd15']
+            get_shared_generator(get_model_path(), draft_mode=False)
+        logger.info("Pipeline pre-warmed")
+    except Exception as e:
+        logger.warning(f"Pipeline pre-warm failed: {e}")
+
+
 def run_generation(job_id, chapter_text, character_data, reference_image_path, settings):
     """Run generation in background thread with error handling"""
-    job = generation_jobs[job_id]
+    job = generation_jobs.get(job_id)
+    
+    # PNG encodes run here so the GPU thread can start the next batch
+    io_pool = ThreadPoolExecutor(max_workers=2)
     
     try:
         job.status = 'processing'
@@ -186,16 +450,12 @@ def run_generation(job_id, chapter_text, character_data, reference_image_path, s
         # Parse chapter
         job.current_step = 'Parsing chapter...'
         parser = ChapterParser()
-        parser.load_from_string(chapter_text)
         
-        # Detect scenes
+        # Detect scenes (only the first max_panels are ever built)
         job.current_step = 'Detecting scenes...'
         use_ai = settings.get('ai_scenes', True)
-        scenes = parser.split_scenes(use_ai=use_ai)
-        
-        # Limit panels
         max_panels = int(settings.get('max_panels', 10))
-        scenes = scenes[:max_panels]
+        scenes = list(parser.iter_scenes(chapter_text, limit=max_panels, use_ai=use_ai))
         job.total_panels = len(scenes)
         job.progress = 10
         
@@ -228,9 +488,13 @@ def run_generation(job_id, chapter_text, character_data, reference_image_path, s
         else:
             # Try AI auto-detection
             try:
-                from ai_helper import ai_helper
-                if ai_helper.is_available():
-                    char_info = ai_helper.extract_character_info(chapter_text)
+                if ai_helper is not None and ai_helper.is_available():
+                    char_key = cache_key('character', chapter_text)
+                    char_info = prompt_cache.get(char_key)
+                    if char_info is None:
+                        char_info = ai_helper.extract_character_info(chapter_text)
+                        if char_info:
+                            prompt_cache.set(char_key, char_info)
                     if char_info:
                         character = CharacterProfile(char_info.get('name', 'protagonist'))
                         character.gender = char_info.get('gender', 'unknown')
@@ -257,15 +521,29 @@ def run_generation(job_id, chapter_text, character_data, reference_image_path, s
         # Apply style
         style = settings.get('style', 'manhwa')
         if style != 'manhwa':
-            try:
-                from styles import style_manager
+            if style_manager is not None:
                 prompt_builder.style = style
-            except Exception as e:
-                logger.warning(f"Style application failed: {e}")
+            else:
+                logger.warning("Style application failed: styles module unavailable")
         
         # Build prompts with AI if enabled
-        use_ai_prompts = settings.get('ai_prompts', True)
-        prompts = prompt_builder.build_batch_prompts(scenes, character, use_ai=use_ai_prompts)
+        use_ai_prompts = (
+            settings.get('ai_prompts', True)
+            and ai_helper is not None
+            and ai_helper.is_available()
+        )
+        
+        # Same chapter + settings + character -> same prompts, skip the LLM
+        prompts_key = cache_key(
+            'prompts', chapter_text, style, max_panels, use_ai, use_ai_prompts,
+            character.get_description()
+        )
+        prompts = prompt_cache.get(prompts_key)
+        if prompts is None:
+            prompts = prompt_builder.build_batch_prompts(scenes, character, use_ai=use_ai_prompts)
+            prompt_cache.set(prompts_key, prompts)
+        else:
+            logger.info(f"Job {job_id}: reusing cached prompts")
         job.progress = 30
         
         # Determine quality settings
@@ -273,57 +551,73 @@ def run_generation(job_id, chapter_text, character_data, reference_image_path, s
         draft_mode = (quality == 'draft')
         upscale = (quality == 'high')
         
-        # Generate panels
-        job.current_step = 'Generating panels...'
-        generator = ManhwaGenerator(draft_mode=draft_mode)
-        
-        # Load appropriate model
-        model = settings.get('model', 'sd15')
-        if model == 'sdxl':
-            import config
-            config.MODEL_ID = 'stabilityai/stable-diffusion-xl-base-1.0'
+        # Generate in sub-batches, updating progress between them
+        save_futures = []
         
-        generator.load_pipeline()
+        def save_batch(start, images):
+            for offset, image in enumerate(images):
+                img_path = FRAMES_DIR / f"panel_{start+offset+1:03d}.png"
+                save_futures.append(io_pool.submit(save_png, image, img_path))
+            
+            done = start + len(images)
+            job.generated_panels = done
+            job.progress = 30 + int((done / len(prompts)) * 60)
+            if done < len(prompts):
+                job.current_step = f'Generating panel {done+1}/{len(prompts)}...'
         
-        # Generate with progress updates
-        for idx, (positive, negative) in enumerate(prompts):
-            job.current_step = f'Generating panel {idx+1}/{len(prompts)}...'
-            job.generated_panels = idx
-            job.progress = 30 + int((idx / len(prompts)) * 60)
+        # Generate panels (one job on the GPU at a time)
+        job.current_step = 'Waiting for GPU...'
+        with _pipeline_cache['lock']:
+            # Load appropriate model
+            model = settings.get('model', 'sd15')
+            config.MODEL_ID = MODEL_IDS.get(model, MODEL_IDS['sd15'])
+            model_id = get_model_path()
             
+            job.current_step = 'Loading model...'
+            generator, batch_size = get_shared_generator(
+                model_id, draft_mode, settings.get('compile', True), max_batch=len(prompts)
+            )
+            
+            job.current_step = f'Generating panel 1/{len(prompts)}...'
             try:
-                image = generator.generate_panel(positive, negative, seed=42 + idx)
-                img_path = FRAMES_DIR / f"panel_{idx+1:03d}.png"
-                image.save(img_path, "PNG", optimize=True)
+                generator.generate_panels_batched(
+                    prompts,
+                    seeds=[42 + idx for idx in range(len(prompts))],
+                    batch_size=batch_size,
+                    on_batch=save_batch
+                )
             except Exception as e:
-                logger.error(f"Panel {idx+1} generation failed: {e}")
+                logger.error(f"Panel {job.generated_panels+1} generation failed: {e}")
                 raise
         
-        generator.unload()
+        # Make sure every panel is on disk (and surface encode errors)
+        wait(save_futures)
+        for future in save_futures:
+            future.result()
         job.generated_panels = len(prompts)
         job.progress = 90
         
+        # Exactly the panels this job wrote; frames/ is shared, so a glob would
+        # also pick up higher-numbered panels left by an earlier, longer job
+        panel_paths = [FRAMES_DIR / f"panel_{i+1:03d}.png" for i in range(len(prompts))]
+        
         # Upscale if high quality
-        if upscale:
+        if upscale and upscale_files is None:
+            logger.warning("Upscaling skipped: upscaler module unavailable")
+        elif upscale:
             try:
                 job.current_step = 'Upscaling panels...'
-                from upscaler import upscaler
-                from PIL import Image
-                
-                upscale_dir = FRAMES_DIR.parent / 'upscaled'
-                upscale_dir.mkdir(exist_ok=True)
                 
-                for panel_file in sorted(FRAMES_DIR.glob('panel_*.png')):
-                    img = Image.open(panel_file)
-                    upscaled = upscaler.upscale_and_enhance(img, scale=2)
-                    upscaled.save(upscale_dir / panel_file.name, 'PNG', optimize=True)
-                
-                # Replace originals with upscaled
-                for f in upscale_dir.glob('*.png'):
-                    shutil.copy(f, FRAMES_DIR / f.name)
+                # Upscaled panels replace the originals in place, in parallel
+                for done, _ in enumerate(upscale_files(panel_paths, scale=2), 1):
+                    job.current_step = f'Upscaling panels ({done}/{len(panel_paths)})...'
             except Exception as e:
                 logger.warning(f"Upscaling failed: {e}")
         
+        # Panel listing/serving reads these from the job
+        job.panel_paths = panel_paths
+        job.panel_names = frozenset(p.name for p in job.panel_paths)
+        
         # Post-process
         job.current_step = 'Creating preview...'
         processor = PostProcessor()
@@ -347,6 +641,21 @@ def run_generation(job_id, chapter_text, character_data, reference_image_path, s
         job.error = str(e)
         job.completed_at = datetime.now()
         logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+    finally:
+        io_pool.shutdown(wait=True)
+
+
+def _generation_worker():
+    """Run queued jobs one at a time so GPU work never overlaps"""
+    while True:
+        args = _job_queue.get()
+        try:
+            run_generation(*args)
+        finally:
+            _job_queue.task_done()
+
+
+threading.Thread(target=_generation_worker, name='generation-worker', daemon=True).start()
 
 
 @app.route('/api/generate', methods=['POST'])
@@ -354,7 +663,7 @@ def run_generation(job_id, chapter_text, character_data, reference_image_path, s
 def generate():
     """Start a new generation job"""
     try:
-        data = request.get_json()
+        data = request.get_json(cache=False)
         
         # Validate input
         chapter_text = validate_text_input(data.get('chapter_text'))
@@ -363,14 +672,16 @@ def generate():
         # Create job
         job_id = str(uuid.uuid4())
         job = GenerationJob(job_id)
-        generation_jobs[job_id] = job
+        generation_jobs.add(job)
         
-        # Start background thread
-        thread = threading.Thread(
-            target=run_generation,
-            args=(job_id, chapter_text, data.get('character'), data.get('reference_image'), settings)
-        )
-        thread.start()
+        # Hand off to the generation worker
+        try:
+            _job_queue.put_nowait(
+                (job_id, chapter_text, data.get('character'), data.get('reference_image'), settings)
+            )
+        except queue.Full:
+            generation_jobs.pop(job_id)
+            return jsonify({'error': 'Generation queue is full. Try again later.'}), 429
         
         return jsonify({
             'success': True,
@@ -380,6 +691,8 @@ def generate():
         
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
+    except HTTPException:
+        raise  # 400/413 from reading the body go to the error handlers
     except Exception as e:
         logger.error(f"Generation request failed: {e}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -418,7 +731,11 @@ def health():
 
 def get_panels(job_id):
     """Get list of generated panels"""
-    panel_files = sorted(FRAMES_DIR.glob("panel_*.png"))
+    job = generation_jobs.get(job_id)
+    if job and job.panel_paths:
+        panel_files = job.panel_paths
+    else:
+        panel_files = sorted(FRAMES_DIR.glob("panel_*.png"))
     
     panels = [{'filename': p.name, 'url': f'/api/panel/{p.name}'} for p in panel_files]
     
@@ -432,9 +749,17 @@ def get_panel(filename):
     if not filename.startswith('panel_') or '..' in filename:
         return jsonify({'error': 'Invalid filename'}), 400
     
+    # Scoped to a job: only serve panels that job actually produced
+    job_id = request.args.get('job')
+    if job_id:
+        job = generation_jobs.get(job_id)
+        if not job or filename not in job.panel_names:
+            return jsonify({'error': 'Panel not found'}), 404
+    
     panel_path = FRAMES_DIR / filename
     if panel_path.exists() and panel_path.is_file():
-        return send_file(panel_path, mimetype='image/png')
+        # Conditional/etag lets the editor revalidate panels with a 304
+        return send_file(panel_path, mimetype='image/png', conditional=True, etag=True)
     
     return jsonify({'error': 'Panel not found'}), 404
 
@@ -458,11 +783,14 @@ def download_bundle(job_id):
     
     bundle_path = Path(job.output_path)
     if bundle_path.exists():
+        # Sized file response (no chunked encoding), resumable via Range
         return send_file(
             bundle_path,
             mimetype='application/zip',
             as_attachment=True,
-            download_name='manhwa_bundle.zip'
+            download_name='manhwa_bundle.zip',
+            conditional=True,
+            etag=True
         )
     
     return jsonify({'error': 'Bundle not found'}), 404
@@ -481,8 +809,10 @@ def export_file(job_id, format):
     if format not in valid_formats:
         return jsonify({'error': 'Invalid format'}), 400
     
+    if exporter is None:
+        return jsonify({'error': 'Export not available'}), 503
+    
     try:
-        from exporter import exporter
         export_dir = OUTPUT_DIR / 'exports'
         export_dir.mkdir(exist_ok=True)
         
@@ -536,10 +866,12 @@ def list_projects():
 def create_project():
     """Create new project"""
     try:
-        data = request.get_json()
+        data = request.get_json(cache=False)
         title = validate_text_input(data.get('title', 'New Manhwa'), max_length=200)
         project = project_manager.create_project(title)
         return jsonify({'success': True, 'project': project.to_dict()})
+    except HTTPException:
+        raise  # 400/413 from reading the body go to the error handlers
     except Exception as e:
         logger.error(f"Error creating project: {e}")
         return jsonify({'error': str(e)}), 500
@@ -557,7 +889,7 @@ def manage_project(project_id):
             return jsonify({'success': True, 'project': project.to_dict()})
         
         elif request.method == 'PUT':
-            data = request.get_json()
+            data = request.get_json(cache=False)
             project = project_manager.update_project(project_id, data)
             if not project:
                 return jsonify({'error': 'Project not found'}), 404
@@ -569,6 +901,8 @@ def manage_project(project_id):
                 return jsonify({'error': 'Project not found'}), 404
             return jsonify({'success': True})
             
+    except HTTPException:
+        raise  # 400/413 from reading the body go to the error handlers
     except Exception as e:
         logger.error(f"Error managing project {project_id}: {e}")
         return jsonify({'error': str(e)}), 500
@@ -591,7 +925,7 @@ def list_characters():
 def create_character():
     """Create new character"""
     try:
-        data = request.get_json()
+        data = request.get_json(cache=False)
         name = validate_text_input(data.get('name', 'Character'), max_length=100)
         char = CharacterProfile(name)
         char.gender = data.get('gender', '')
@@ -601,6 +935,8 @@ def create_character():
         char.default_outfit = data.get('default_outfit', '')
         character_library.add_character(char)
         return jsonify({'success': True, 'character': char.to_dict()})
+    except HTTPException:
+        raise  # 400/413 from reading the body go to the error handlers
     except Exception as e:
         logger.error(f"Error creating character: {e}")
         return jsonify({'error': str(e)}), 500
@@ -611,7 +947,7 @@ def create_character():
 def preview_panels():
     """Generate panel prompts for preview/editing"""
     try:
-        data = request.get_json()
+        data = request.get_json(cache=False)
         chapter_text = validate_text_input(data.get('chapter_text', ''))
         project_id = data.get('project_id', 'temp')
         parser = ChapterParser()
@@ -622,6 +958,8 @@ def preview_panels():
         panels = editor.create_panels_from_scenes(scenes, prompt_builder, character_library)
         panel_editors[project_id] = editor
         return jsonify({'success': True, 'panels': [p.to_dict() for p in panels]})
+    except HTTPException:
+        raise  # 400/413 from reading the body go to the error handlers
     except Exception as e:
         logger.error(f"Error previewing panels: {e}")
         return jsonify({'error': str(e)}), 500
@@ -635,7 +973,7 @@ def update_panel(project_id, panel_id):
         editor = panel_editors.get(project_id)
         if not editor:
             return jsonify({'error': 'Panel editor not found'}), 404
-        data = request.get_json()
+        data = request.get_json(cache=False)
         success = editor.update_panel(
             panel_id,
             edited_prompt=data.get('edited_prompt'),
@@ -650,6 +988,8 @@ def update_panel(project_id, panel_id):
             return jsonify({'error': 'Panel not found'}), 404
         panel = editor.get_panel(panel_id)
         return jsonify({'success': True, 'panel': panel.to_dict()})
+    except HTTPException:
+        raise  # 400/413 from reading the body go to the error handlers
     except Exception as e:
         logger.error(f"Error updating panel: {e}")
         return jsonify({'error': str(e)}), 500
@@ -672,6 +1012,8 @@ def internal_error(error):
 
 @app.errorhandler(413)
 def request_entity_too_large(error):
+    if request.is_json:
+        return jsonify({'error': f'Request too large (max {MAX_JSON_BODY // (1024 * 1024)}MB)'}), 413
     return jsonify({'error': 'File too large (max 50MB)'}), 413
 
 
@@ -691,6 +1033,12 @@ if __name__ == '__main__':
     
     debug_mode = os.getenv('FLASK_ENV') != 'production'
     
+    # Pre-warm in the serving process only (the debug reloader's parent
+    # process never handles requests)
+    prewarm = os.getenv('PREWARM_PIPELINE', '1').lower() in ('1', 'true', 'yes')
+    if prewarm and (not debug_mode or os.getenv('WERKZEUG_RUN_MAIN') == 'true'):
+        threading.Thread(target=prewarm_pipeline, name='pipeline-prewarm', daemon=True).start()
+    
     if debug_mode:
         app.run(debug=True, host='0.0.0.0', port=5000)
     else:
@@ -1,10 +1,10 @@
 """
 Bundle output files into a distributable ZIP package
 """
-import shutil
 from pathlib import Path
 from datetime import datetime
 import json
+import zipfile
 
 from config import OUTPUT_DIR, FRAMES_DIR, PROMPTS_DIR, REFERENCE_DIR, BUNDLE_NAME
 
@@ -54,7 +54,7 @@ class Bundler:
         
         # 3. Reference images
         if include_reference and REFERENCE_DIR.exists():
-            ref_files = list(REFERENCE_DIR.glob("*"))
+            ref_files = [f for f in REFERENCE_DIR.glob("*") if f.is_file()]
             files_to_bundle.extend(ref_files)
             print(f"  Adding {len(ref_files)} reference files")
         
@@ -64,39 +64,26 @@ class Bundler:
             files_to_bundle.append(preview_path)
             print("  Adding vertical preview")
         
-        # 5. Create README for bundle
-        readme_path = self.output_dir / "BUNDLE_README.txt"
-        self._create_bundle_readme(readme_path, len(panel_files))
-        files_to_bundle.append(readme_path)
-        
-        # 6. Create metadata
-        metadata_path = self.output_dir / "metadata.json"
-        self._create_metadata(metadata_path, len(panel_files))
-        files_to_bundle.append(metadata_path)
-        
-        # Create ZIP archive
-        # Remove .zip extension as make_archive adds it
-        base_name = str(self.bundle_path.with_suffix(''))
-        
-        print(f"\nPacking {len(files_to_bundle)} files...")
-        
-        # Create temporary directory structure
-        temp_dir = self.output_dir / "temp_bundle"
-        temp_dir.mkdir(exist_ok=True)
+        print(f"\nPacking {len(files_to_bundle) + 2} files...")
         
         try:
-            # Copy files with proper structure
-            for file in files_to_bundle:
-                rel_path = file.relative_to(self.output_dir)
-                dest = temp_dir / rel_path
-                dest.parent.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(file, dest)
-            
-            # Create archive
-            shutil.make_archive(base_name, 'zip', temp_dir)
-            
-            # Clean up temp
-            shutil.rmtree(temp_dir)
+            # Images are already compressed, so store them as-is straight
+            # from their source paths (no temp copy, no second DEFLATE pass)
+            with zipfile.ZipFile(self.bundle_path, 'w', zipfile.ZIP_STORED, allowZip64=True) as zf:
+                for file in files_to_bundle:
+                    zf.write(file, arcname=file.relative_to(self.output_dir).as_posix())
+                
+                # 5. README and 6. metadata are small text, which does compress
+                zf.writestr(
+                    "BUNDLE_README.txt",
+                    self._create_bundle_readme(len(panel_files)),
+                    compress_type=zipfile.ZIP_DEFLATED
+                )
+                zf.writestr(
+                    "metadata.json",
+                    self._create_metadata(len(panel_files)),
+                    compress_type=zipfile.ZIP_DEFLATED
+                )
             
             print(f"✓ Bundle created: {self.bundle_path}")
             print(f"  Size: {self.bundle_path.stat().st_size / 1024 / 1024:.1f} MB")
@@ -105,12 +92,11 @@ class Bundler:
             
         except Exception as e:
             print(f"✗ Failed to create bundle: {e}")
-            if temp_dir.exists():
-                shutil.rmtree(temp_dir)
+            self.bundle_path.unlink(missing_ok=True)
             return None
     
-    def _create_bundle_readme(self, path: Path, num_panels: int):
-        """Create README file for the bundle"""
+    def _create_bundle_readme(self, num_panels: int) -> str:
+        """Create README text for the bundle"""
         content = f"""
 ╔══════════════════════════════════════════════════════════════╗
 ║         MANHWA AUTO-PANEL GENERATOR - Output Bundle         ║
@@ -169,11 +155,10 @@ Generated by Manhwa Auto-Panel Generator
 https://github.com/yourusername/manhwa-generator
 
 """
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        return content
     
-    def _create_metadata(self, path: Path, num_panels: int):
-        """Create metadata JSON file"""
+    def _create_metadata(self, num_panels: int) -> str:
+        """Create metadata JSON text"""
         from config import (
             MODEL_ID, PANEL_WIDTH, PANEL_HEIGHT,
             NUM_INFERENCE_STEPS, GUIDANCE_SCALE
@@ -191,8 +176,7 @@ https://github.com/yourusername/manhwa-generator
             }
         }
         
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2)
+        return json.dumps(metadata, indent=2)
 
 
 # ============================================================================
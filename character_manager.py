@@ -2,15 +2,126 @@
 Enhanced character manager with reference image support and detailed profiles
 """
 from pathlib import Path
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import hashlib
 import json
-from typing import Optional, List, Dict
+import mmap
+import pickle
+import os
+import threading
+from typing import Optional, List, Dict, Set
 from PIL import Image
 import uuid
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+
+REFERENCE_MAX_SIZE = 512  # Longest side kept for decoded reference images
+
+
+def _file_sha256(path: Path) -> str:
+    """Hash file contents in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _dumps(data: Dict) -> bytes:
+    """Serialize to indented UTF-8 JSON (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, indent=2).encode('utf-8')
+
+
+def _loads(raw: bytes) -> Dict:
+    """Parse JSON bytes (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+MMAP_MIN_SIZE = 4096  # Below this, mmap setup costs more than a read()
+
+
+def _read_json(path: Path) -> Dict:
+    """
+    Read and parse one JSON file (thread pool worker)
+    
+    Larger files are parsed by orjson straight out of a read-only mmap, so
+    the page cache backs the parse without an intermediate bytes copy.
+    """
+    with open(path, 'rb') as f:
+        if ORJSON_AVAILABLE and os.fstat(f.fileno()).st_size >= MMAP_MIN_SIZE:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
+        return _loads(f.read())
+
+
+def _read_fields(path: Path, fields: Set[str]) -> Dict:
+    """
+    Read only the given top-level keys from a JSON object file
+    
+    With ijson the file is stream-parsed and reading stops as soon as every
+    requested key has been seen; otherwise it's a full parse + filter.
+    """
+    if IJSON_AVAILABLE:
+        found = {}
+        with open(path, 'rb') as f:
+            for key, value in ijson.kvitems(f, ''):
+                if key in fields:
+                    found[key] = value
+                    if len(found) == len(fields):
+                        break
+        return found
+    
+    data = _read_json(path)
+    return {key: data[key] for key in fields if key in data}
+
+
+@lru_cache(maxsize=64)
+def _load_reference(sha256_hex: str, path: str) -> Image.Image:
+    """
+    Decode and normalize a reference image, cached by content hash
+    
+    The hash is part of the key so an edited file at the same path is
+    re-read, while the same image uploaded again under a new name is not.
+    """
+    with Image.open(path) as img:
+        img = img.convert('RGB')
+        img.thumbnail((REFERENCE_MAX_SIZE, REFERENCE_MAX_SIZE))
+    return img
+
+
+_MISSING = object()
+
 
 class CharacterProfile:
     """Detailed character profile with reference images"""
     
+    # Libraries can hold thousands of profiles; slots drop the per-instance dict
+    __slots__ = (
+        'name', 'character_id', 'gender', 'age', 'height', 'build',
+        'hair_color', 'hair_style', 'eye_color', 'skin_tone',
+        'distinguishing_features', 'default_outfit', 'outfit_variations',
+        'personality', 'vibe', 'expressions', 'reference_images',
+        'face_reference', 'reference_image', 'notes', 'tags', '_description'
+    )
+    
     def __init__(self, name: str):
         self.name = name
         self.character_id = str(uuid.uuid4())[:8]
@@ -40,144 +151,271 @@ class CharacterProfile:
         # Reference images
         self.reference_images = []  # List of image paths
         self.face_reference = None  # Primary face reference
+        self.reference_image = None  # Decoded face reference (not saved)
         
         # Metadata
         self.notes = ""
         self.tags = []
+        
+        self._description = None  # get_description() cache
+    
+    # Saved fields in file order, with defaults for keys missing from older
+    # files; list factories give every profile its own list
+    _FIELDS = (
+        ('character_id', None), ('name', 'Character'),
+        ('gender', 'unknown'), ('age', 'young adult'), ('height', ''), ('build', ''),
+        ('hair_color', ''), ('hair_style', ''), ('eye_color', ''), ('skin_tone', ''),
+        ('distinguishing_features', ''), ('default_outfit', ''),
+        ('outfit_variations', list), ('personality', ''), ('vibe', ''),
+        ('expressions', list), ('reference_images', list), ('face_reference', None),
+        ('notes', ''), ('tags', list)
+    )
     
     def to_dict(self) -> Dict:
         """Convert to dictionary for saving"""
-        return {
-            'character_id': self.character_id,
-            'name': self.name,
-            'gender': self.gender,
-            'age': self.age,
-            'height': self.height,
-            'build': self.build,
-            'hair_color': self.hair_color,
-            'hair_style': self.hair_style,
-            'eye_color': self.eye_color,
-            'skin_tone': self.skin_tone,
-            'distinguishing_features': self.distinguishing_features,
-            'default_outfit': self.default_outfit,
-            'outfit_variations': self.outfit_variations,
-            'personality': self.personality,
-            'vibe': self.vibe,
-            'expressions': self.expressions,
-            'reference_images': self.reference_images,
-            'face_reference': self.face_reference,
-            'notes': self.notes,
-            'tags': self.tags
-        }
+        return {key: getattr(self, key) for key, _ in self._FIELDS}
     
     @classmethod
     def from_dict(cls, data: Dict):
         """Create from dictionary"""
         char = cls(data.get('name', 'Character'))
         char.character_id = data.get('character_id', char.character_id)
-        char.gender = data.get('gender', 'unknown')
-        char.age = data.get('age', 'young adult')
-        char.height = data.get('height', '')
-        char.build = data.get('build', '')
-        char.hair_color = data.get('hair_color', '')
-        char.hair_style = data.get('hair_style', '')
-        char.eye_color = data.get('eye_color', '')
-        char.skin_tone = data.get('skin_tone', '')
-        char.distinguishing_features = data.get('distinguishing_features', '')
-        char.default_outfit = data.get('default_outfit', '')
-        char.outfit_variations = data.get('outfit_variations', [])
-        char.personality = data.get('personality', '')
-        char.vibe = data.get('vibe', '')
-        char.expressions = data.get('expressions', [])
-        char.reference_images = data.get('reference_images', [])
-        char.face_reference = data.get('face_reference')
-        char.notes = data.get('notes', '')
-        char.tags = data.get('tags', [])
+        get = data.get
+        for key, default in cls._FIELDS[2:]:
+            value = get(key, _MISSING)
+            if value is _MISSING:
+                value = default() if default is list else default
+            setattr(char, key, value)
         return char
     
-    def get_description(self) -> str:
-        """Get full character description for prompts"""
-        parts = [self.name]
-        
-        if self.gender and self.gender != 'unknown':
-            parts.append(self.gender)
-        
-        if self.age:
-            parts.append(f"{self.age} years old")
+    def load_reference_image(self, image_path: str) -> Image.Image:
+        """
+        Load a reference image and use it as the face reference
         
-        if self.hair_color and self.hair_style:
-            parts.append(f"{self.hair_color} {self.hair_style} hair")
-        elif self.hair_color:
-            parts.append(f"{self.hair_color} hair")
-        
-        if self.eye_color:
-            parts.append(f"{self.eye_color} eyes")
-        
-        if self.default_outfit:
-            parts.append(f"wearing {self.default_outfit}")
+        Decoded images are shared across profiles and jobs, so iterating on
+        the same character doesn't re-decode its reference every run.
+        """
+        image_path = Path(image_path)
+        self.reference_image = _load_reference(_file_sha256(image_path), str(image_path))
         
-        if self.distinguishing_features:
-            parts.append(self.distinguishing_features)
+        if str(image_path) not in self.reference_images:
+            self.reference_images.append(str(image_path))
+        self.face_reference = str(image_path)
         
-        if self.vibe:
-            parts.append(f"{self.vibe} expression")
+        return self.reference_image
+    
+    def get_description(self) -> str:
+        """Get full character description for prompts (cached; see invalidate_description)"""
+        if self._description is None:
+            self._description = self._build_description()
+        return self._description
+    
+    def invalidate_description(self):
+        """Drop the cached description after editing fields it uses"""
+        self._description = None
+    
+    def _build_description(self) -> str:
+        if self.hair_color:
+            hair = f"{self.hair_color} {self.hair_style} hair" if self.hair_style else f"{self.hair_color} hair"
+        else:
+            hair = ''
         
-        return ", ".join(parts)
+        # Empty/unset fragments are dropped by filter() in C
+        return ", ".join((self.name, *filter(None, (
+            self.gender if self.gender != 'unknown' else '',
+            f"{self.age} years old" if self.age else '',
+            hair,
+            f"{self.eye_color} eyes" if self.eye_color else '',
+            f"wearing {self.default_outfit}" if self.default_outfit else '',
+            self.distinguishing_features,
+            f"{self.vibe} expression" if self.vibe else ''
+        ))))
 
 
 class CharacterLibrary:
-    """Manage character library with reference images"""
+    """
+    Manage character library with reference images
+    
+    Listing only needs a few fields per character, so those are kept in a
+    small _index.json; full profiles are parsed on first use and memoized.
+    """
+    
+    INDEX_FILE = "_index.json"
+    INDEX_FIELDS = {'character_id', 'name', 'gender', 'face_reference', 'reference_images'}
+    SNAPSHOT_FILE = "library.pkl.gz"  # Derived; JSON files stay the source of truth
     
     def __init__(self, library_dir: str = "character_library"):
         self.library_dir = Path(library_dir)
         self.library_dir.mkdir(exist_ok=True)
-        self.characters = {}
-        self.load_all()
+        self._profiles = {}  # Fully loaded profiles, by id
+        self._index = {}  # Listing fields, by id
+        self._all_loaded = False
+        self._lock = threading.RLock()
+        self._load_index()
+    
+    @property
+    def characters(self) -> Dict[str, CharacterProfile]:
+        """All profiles (parses any not loaded yet)"""
+        if not self._all_loaded:
+            self.load_all()
+        return self._profiles
+    
+    @staticmethod
+    def _index_entry(character: CharacterProfile) -> Dict:
+        return {
+            'character_id': character.character_id,
+            'name': character.name,
+            'gender': character.gender,
+            'has_reference': bool(character.face_reference),
+            'ref_images': len(character.reference_images)
+        }
+    
+    def _char_files(self) -> List[Path]:
+        return [p for p in self.library_dir.glob("*.json") if p.name != self.INDEX_FILE]
+    
+    def _load_index(self):
+        """Load the listing index, rebuilding it if it's missing or out of date"""
+        index_path = self.library_dir / self.INDEX_FILE
+        on_disk = {p.stem for p in self._char_files()}
+        
+        if index_path.exists():
+            try:
+                self._index = _read_json(index_path)
+            except (OSError, ValueError):
+                self._index = {}
+        
+        if set(self._index) != on_disk:
+            # One-time scan (or files were added/removed behind our back);
+            # only the listing fields are read from each file
+            self._index = {cid: entry for cid, entry in self._index.items() if cid in on_disk}
+            for char_file in self._char_files():
+                if char_file.stem not in self._index:
+                    character = self.load_character(char_file.stem, fields=self.INDEX_FIELDS)
+                    self._index[char_file.stem] = self._index_entry(character)
+            self._write_index()
+    
+    def _load_snapshot(self) -> bool:
+        """Fill profiles from the snapshot if it's newer than every JSON file"""
+        snapshot_path = self.library_dir / self.SNAPSHOT_FILE
+        char_files = self._char_files()
+        if not char_files or not snapshot_path.exists():
+            return False
+        
+        try:
+            if snapshot_path.stat().st_mtime < max(p.stat().st_mtime for p in char_files):
+                return False
+            with gzip.open(snapshot_path, 'rb') as f:
+                snapshot = pickle.load(f)
+            if set(snapshot['chars']) != {p.stem for p in char_files}:
+                return False
+        except (OSError, EOFError, KeyError, pickle.UnpicklingError):
+            return False
+        
+        for cid, data in snapshot['chars'].items():
+            self._profiles[cid] = CharacterProfile.from_dict(data)
+        return True
+    
+    def _write_snapshot(self):
+        snapshot_path = self.library_dir / self.SNAPSHOT_FILE
+        tmp_path = snapshot_path.with_name(snapshot_path.name + '.tmp')
+        chars = {cid: c.to_dict() for cid, c in self._profiles.items()}
+        try:
+            with gzip.open(tmp_path, 'wb') as f:
+                pickle.dump({'chars': chars}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, snapshot_path)
+        except OSError as e:
+            print(f"⚠ Could not write character snapshot: {e}")
+    
+    def _invalidate_snapshot(self):
+        (self.library_dir / self.SNAPSHOT_FILE).unlink(missing_ok=True)
+    
+    def _write_index(self):
+        index_path = self.library_dir / self.INDEX_FILE
+        tmp_path = index_path.with_name(index_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(_dumps(self._index))
+        os.replace(tmp_path, index_path)
     
     def add_character(self, character: CharacterProfile):
         """Add character to library"""
-        self.characters[character.character_id] = character
+        with self._lock:
+            self._profiles[character.character_id] = character
         self.save_character(character)
     
     def save_character(self, character: CharacterProfile):
         """Save character profile"""
         char_file = self.library_dir / f"{character.character_id}.json"
         
-        with open(char_file, 'w', encoding='utf-8') as f:
-            json.dump(character.to_dict(), f, indent=2)
+        # Saving is how edits are committed, so rebuild the prompt text too
+        character.invalidate_description()
+        
+        with open(char_file, 'wb') as f:
+            f.write(_dumps(character.to_dict()))
+        
+        with self._lock:
+            self._index[character.character_id] = self._index_entry(character)
+            self._write_index()
+            self._invalidate_snapshot()
     
-    def load_character(self, character_id: str) -> Optional[CharacterProfile]:
-        """Load character from file"""
+    def load_character(
+        self,
+        character_id: str,
+        fields: Optional[Set[str]] = None
+    ) -> Optional[CharacterProfile]:
+        """
+        Load character from file
+        
+        Args:
+            character_id: Character to load
+            fields: Only read these keys (others keep their defaults)
+        """
         char_file = self.library_dir / f"{character_id}.json"
         
         if not char_file.exists():
             return None
         
-        with open(char_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        if fields:
+            data = _read_fields(char_file, fields)
+        else:
+            data = _read_json(char_file)
         
         return CharacterProfile.from_dict(data)
     
+    def get_character(self, character_id: str) -> Optional[CharacterProfile]:
+        """Get a profile, parsing its file on first use"""
+        with self._lock:
+            character = self._profiles.get(character_id)
+            if character is None and character_id in self._index:
+                character = self.load_character(character_id)
+                if character is not None:
+                    self._profiles[character_id] = character
+            return character
+    
     def load_all(self):
         """Load all characters from library"""
-        for char_file in self.library_dir.glob("*.json"):
-            with open(char_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                character = CharacterProfile.from_dict(data)
-                self.characters[character.character_id] = character
+        with self._lock:
+            # One snapshot read instead of N JSON parses when nothing changed
+            if not self._profiles and self._load_snapshot():
+                self._all_loaded = True
+                return
+            
+            char_files = [p for p in self._char_files() if p.stem not in self._profiles]
+            
+            if char_files:
+                # File reads overlap across threads; profiles are built on
+                # this thread so the memo needs no extra locking
+                with ThreadPoolExecutor(max_workers=min(32, len(char_files))) as pool:
+                    for data in pool.map(_read_json, char_files):
+                        character = CharacterProfile.from_dict(data)
+                        self._profiles[character.character_id] = character
+                self._write_snapshot()
+            
+            self._all_loaded = True
     
     def list_characters(self) -> List[Dict]:
         """List all characters"""
-        return [
-            {
-                'character_id': char.character_id,
-                'name': char.name,
-                'gender': char.gender,
-                'has_reference': bool(char.face_reference),
-                'ref_images': len(char.reference_images)
-            }
-            for char in self.characters.values()
-        ]
+        with self._lock:
+            return [dict(entry) for entry in self._index.values()]
     
     def delete_character(self, character_id: str) -> bool:
         """Delete character"""
@@ -185,8 +423,11 @@ class CharacterLibrary:
         
         if char_file.exists():
             char_file.unlink()
-            if character_id in self.characters:
-                del self.characters[character_id]
+            with self._lock:
+                self._profiles.pop(character_id, None)
+                if self._index.pop(character_id, None) is not None:
+                    self._write_index()
+                self._invalidate_snapshot()
             return True
         
         return False
@@ -198,7 +439,7 @@ class CharacterLibrary:
         set_as_face: bool = False
     ) -> bool:
         """Add reference image to character"""
-        character = self.characters.get(character_id)
+        character = self.get_character(character_id)
         
         if not character:
             return False
@@ -216,8 +457,9 @@ class CharacterLibrary:
         new_image_name = f"ref_{len(character.reference_images) + 1}{image_path.suffix}"
         new_image_path = char_images_dir / new_image_name
         
+        # copyfile skips copy()'s chmod; on Linux it copies in-kernel via sendfile
         import shutil
-        shutil.copy(image_path, new_image_path)
+        shutil.copyfile(image_path, new_image_path)
         
         # Update character
         character.reference_images.append(str(new_image_path))
@@ -230,8 +472,21 @@ class CharacterLibrary:
         return True
 
 
-# Global instance
-character_library = CharacterLibrary()
+# Global instance, created on first access (PEP 562) so importing this
+# module doesn't scan the library directory
+_lib = None
+_lib_lock = threading.Lock()
+
+
+def __getattr__(name: str):
+    if name == "character_library":
+        global _lib
+        if _lib is None:
+            with _lib_lock:
+                if _lib is None:
+                    _lib = CharacterLibrary()
+        return _lib
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@
 Configuration settings for Manhwa Auto-Panel Generator
 """
 import os
+from functools import lru_cache
 from pathlib import Path
 
 # ============================================================================
@@ -17,6 +18,11 @@ FRAMES_DIR = OUTPUT_DIR / "frames"
 PROMPTS_DIR = OUTPUT_DIR / "prompts"
 REFERENCE_DIR = OUTPUT_DIR / "reference"
 
+# Persistent caches (prompts, character extraction, generated panels)
+CACHE_DIR = PROJECT_ROOT / "cache"
+PANEL_CACHE_DIR = CACHE_DIR / "panels"
+PANEL_CACHE_MAX_ENTRIES = 500  # Full-size PNGs; least recently used are dropped beyond this
+
 # ============================================================================
 # MODEL CONFIGURATION
 # ============================================================================
@@ -31,7 +37,8 @@ MODEL_ID = "runwayml/stable-diffusion-v1-5"
 LOCAL_MODEL_PATH = MODELS_DIR / "stable-diffusion-v1-5"
 
 # Use local model if it exists, otherwise download from HuggingFace
-USE_LOCAL_MODEL = LOCAL_MODEL_PATH.exists()
+# (None = auto-detect on first use; set True/False to force)
+USE_LOCAL_MODEL = None
 
 # ============================================================================
 # GENERATION PARAMETERS
@@ -94,22 +101,40 @@ def get_device():
         return "cpu"
 
 def get_dtype():
-    """Lazy dtype detection"""
+    """Lazy dtype detection (bf16 on Ampere+ GPUs, fp16 on older ones)"""
     try:
         import torch
         device = get_device()
-        return torch.float16 if device == "cuda" else torch.float32
+        if DTYPE_OVERRIDE:
+            return getattr(torch, DTYPE_OVERRIDE)
+        if device != "cuda":
+            return torch.float32
+        if PREFER_BF16 and torch.cuda.is_bf16_supported():
+            return torch.bfloat16
+        return torch.float16
     except ImportError:
         return None
 
+# bf16 has fp32's range, so no overflow-to-NaN black panels on long runs
+PREFER_BF16 = True
+
+# Force a dtype by torch name ("bfloat16", "float16", "float32"); None = auto
+DTYPE_OVERRIDE = None
+
 # For backward compatibility, set defaults
 DEVICE = "cpu"  # Will be updated when generator loads
 DTYPE = None  # Will be updated when generator loads
 
 # Memory optimization
-ENABLE_ATTENTION_SLICING = True
-ENABLE_VAE_SLICING = True
-ENABLE_XFORMERS = False  # Set to True if you have xformers installed
+ENABLE_ATTENTION_SLICING = True  # Only used when PyTorch SDPA attention is unavailable
+ENABLE_VAE_SLICING = True  # Skipped on GPUs with 8GB+ VRAM
+ENABLE_XFORMERS = False  # Set to True if you have xformers installed (preferred over SDPA)
+
+# torch.compile the UNet/VAE decoder on CUDA (first panel pays the compile cost)
+ENABLE_TORCH_COMPILE = True
+
+# Panels per pipeline call (None = pick from available VRAM)
+PANEL_BATCH_SIZE = None
 
 # ============================================================================
 # SCENE SPLITTING PARAMETERS
@@ -168,9 +193,15 @@ def create_directories():
         dir_path.mkdir(parents=True, exist_ok=True)
     print(f"[OK] Directories created at {OUTPUT_DIR}")
 
+@lru_cache(maxsize=1)
+def _local_model_exists() -> bool:
+    """Checked once, on first use rather than at import"""
+    return LOCAL_MODEL_PATH.exists()
+
 def get_model_path():
     """Returns the model path to use"""
-    if USE_LOCAL_MODEL and LOCAL_MODEL_PATH.exists():
+    use_local = _local_model_exists() if USE_LOCAL_MODEL is None else USE_LOCAL_MODEL
+    if use_local and _local_model_exists():
         return str(LOCAL_MODEL_PATH)
     return MODEL_ID
 
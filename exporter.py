@@ -2,10 +2,31 @@
 Export utilities for different formats
 """
 from PIL import Image
+import numpy as np
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
+from functools import lru_cache
 import zipfile
 import shutil
+import os
+import re
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    import json
+    ORJSON_AVAILABLE = False
+
+try:
+    import pyvips
+    PYVIPS_AVAILABLE = True
+except (ImportError, OSError):  # OSError: Python binding present but no libvips
+    PYVIPS_AVAILABLE = False
 
 try:
     from reportlab.lib.pagesizes import A4, letter
@@ -16,6 +37,44 @@ except ImportError:
     REPORTLAB_AVAILABLE = False
     print("⚠ ReportLab not available - PDF export disabled")
 
+
+_DIGITS_RE = re.compile(r'(\d+)')
+
+
+@lru_cache(maxsize=8)
+def _list_panels(panel_dir: str, mtime_ns: int) -> Tuple[Path, ...]:
+    """Sorted panel files; mtime_ns is only part of the cache key"""
+    # scandir filters on names and cached d_type without a stat per entry
+    with os.scandir(panel_dir) as it:
+        names = [
+            e.name for e in it
+            if e.name.startswith('panel_') and e.name.endswith('.png') and e.is_file()
+        ]
+    # Natural order, so unpadded names still put panel_10 after panel_9
+    names.sort(key=lambda n: [int(t) if t.isdigit() else t for t in _DIGITS_RE.split(n)])
+    return tuple(Path(panel_dir, n) for n in names)
+
+
+def _zip_member_current(info: zipfile.ZipInfo, path: Path) -> bool:
+    """True if a ZIP member still matches the file it was written from"""
+    st = path.stat()
+    # ZIP timestamps are local time with 2-second resolution
+    written = time.mktime(info.date_time + (0, 0, -1))
+    return info.file_size == st.st_size and st.st_mtime < written + 2
+
+
+def _panels_in(panel_dir: Path) -> List[Path]:
+    """
+    List panels, rescanning only when the directory changed
+    
+    Adding, removing or replacing a panel bumps the directory mtime, so
+    back-to-back exports of the same output share one scan.
+    """
+    panel_dir = Path(panel_dir)
+    if not panel_dir.is_dir():
+        return []
+    return list(_list_panels(str(panel_dir.resolve()), panel_dir.stat().st_mtime_ns))
+
 
 class Exporter:
     """Export panels to various formats"""
@@ -41,7 +100,7 @@ class Exporter:
             print("✗ PDF export requires reportlab: pip install reportlab")
             return False
         
-        panels = sorted(panel_dir.glob("panel_*.png"))
+        panels = _panels_in(panel_dir)
         
         if not panels:
             print("✗ No panels found")
@@ -52,6 +111,8 @@ class Exporter:
         
         for panel_path in panels:
             img = Image.open(panel_path)
+            # Hand the decoded image to reportlab so the PNG is only decoded once
+            reader = ImageReader(img)
             
             # Determine page size
             if page_size is None:
@@ -64,7 +125,7 @@ class Exporter:
             
             # Add image to page
             c.drawImage(
-                str(panel_path),
+                reader,
                 0, 0,
                 width=page_w,
                 height=page_h,
@@ -88,26 +149,74 @@ class Exporter:
         
         CBZ is just a ZIP file with images in reading order
         """
-        panels = sorted(panel_dir.glob("panel_*.png"))
+        panels = _panels_in(panel_dir)
         
         if not panels:
             print("✗ No panels found")
             return False
         
-        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as cbz:
-            for idx, panel in enumerate(panels):
-                # Rename with zero-padded numbers for proper ordering
-                arcname = f"{idx+1:04d}.png"
+        metadata_json = None
+        if metadata:
+            if ORJSON_AVAILABLE:
+                metadata_json = orjson.dumps(metadata, option=orjson.OPT_INDENT_2)
+            else:
+                metadata_json = json.dumps(metadata, indent=2).encode('utf-8')
+        
+        # Rename with zero-padded numbers for proper ordering
+        entries = [(panel, f"{idx+1:04d}.png") for idx, panel in enumerate(panels)]
+        
+        mode, pending = self._plan_cbz_update(output_path, entries, metadata_json)
+        if mode is None:
+            print(f"✓ CBZ up to date: {output_path}")
+            return True
+        
+        # PNGs are already deflated, so store them as-is
+        with zipfile.ZipFile(output_path, mode, zipfile.ZIP_STORED) as cbz:
+            for panel, arcname in pending:
                 cbz.write(panel, arcname)
             
             # Add metadata if provided
-            if metadata:
-                import json
-                cbz.writestr("metadata.json", json.dumps(metadata, indent=2))
+            if metadata_json is not None and mode == 'w':
+                cbz.writestr("metadata.json", metadata_json, compress_type=zipfile.ZIP_DEFLATED)
         
         print(f"✓ CBZ saved: {output_path}")
         return True
     
+    def _plan_cbz_update(self, output_path: Path, entries: list, metadata_json):
+        """
+        Work out how much of an existing CBZ can be kept
+        
+        ZIP members can't be replaced in place, so this returns ('a', new)
+        when panels were only added at the end, (None, []) when nothing
+        changed, and ('w', entries) for a full rewrite otherwise.
+        """
+        output_path = Path(output_path)
+        if not output_path.exists():
+            return 'w', entries
+        
+        try:
+            with zipfile.ZipFile(output_path) as cbz:
+                existing = {info.filename: info for info in cbz.infolist()}
+                old_metadata = cbz.read("metadata.json") if "metadata.json" in existing else None
+        except (OSError, zipfile.BadZipFile):
+            return 'w', entries
+        
+        if old_metadata != metadata_json:
+            return 'w', entries
+        existing.pop("metadata.json", None)
+        
+        new_entries = []
+        for panel, arcname in entries:
+            info = existing.pop(arcname, None)
+            if info is None:
+                new_entries.append((panel, arcname))
+            elif new_entries or not _zip_member_current(info, panel):
+                return 'w', entries
+        
+        if existing:  # Panels were removed
+            return 'w', entries
+        return ('a', new_entries) if new_entries else (None, [])
+    
     def export_vertical_scroll(
         self,
         panel_dir: Path,
@@ -118,29 +227,39 @@ class Exporter:
         """
         Create single vertical scroll image (perfect for webtoons)
         """
-        panels = sorted(panel_dir.glob("panel_*.png"))
+        panels = _panels_in(panel_dir)
         
         if not panels:
             print("✗ No panels found")
             return False
         
+        if PYVIPS_AVAILABLE:
+            return self._export_vertical_scroll_vips(panels, output_path, spacing, background_color)
+        
         # Load all images
-        images = [Image.open(p) for p in panels]
+        arrays = [np.asarray(Image.open(p).convert('RGB')) for p in panels]
         
         # Calculate total size
-        max_width = max(img.width for img in images)
-        total_height = sum(img.height for img in images) + (spacing * (len(images) - 1))
-        
-        # Create canvas
-        scroll = Image.new('RGB', (max_width, total_height), background_color)
-        
-        # Paste panels
-        current_y = 0
-        for img in images:
+        max_width = max(arr.shape[1] for arr in arrays)
+        total_height = sum(arr.shape[0] for arr in arrays) + (spacing * (len(arrays) - 1))
+        background = np.array(background_color[:3], dtype=np.uint8)
+        
+        # Build strips (panels + spacers), then stack them in one copy
+        strips = []
+        for idx, arr in enumerate(arrays):
+            if idx and spacing:
+                strips.append(np.broadcast_to(background, (spacing, max_width, 3)))
+            
             # Center horizontally if image is narrower
-            x_offset = (max_width - img.width) // 2
-            scroll.paste(img, (x_offset, current_y))
-            current_y += img.height + spacing
+            if arr.shape[1] < max_width:
+                block = np.empty((arr.shape[0], max_width, 3), dtype=np.uint8)
+                block[:] = background
+                x_offset = (max_width - arr.shape[1]) // 2
+                block[:, x_offset:x_offset + arr.shape[1]] = arr
+                arr = block
+            strips.append(arr)
+        
+        scroll = Image.fromarray(np.concatenate(strips, axis=0))
         
         # Save
         scroll.save(output_path, "PNG", optimize=True)
@@ -148,6 +267,42 @@ class Exporter:
         print(f"  Size: {max_width}x{total_height}px")
         return True
     
+    def _export_vertical_scroll_vips(
+        self,
+        panels: List[Path],
+        output_path: Path,
+        spacing: int,
+        background_color: tuple
+    ):
+        """
+        Streamed vertical scroll via libvips
+        
+        Panels are read sequentially and joined lazily, so only a few
+        scanlines are resident while the PNG is written instead of the
+        whole scroll.
+        """
+        background = list(background_color[:3])
+        
+        def load(path):
+            tile = pyvips.Image.new_from_file(str(path), access='sequential')
+            if tile.hasalpha():
+                tile = tile.flatten(background=background)
+            if tile.bands < 3:
+                tile = tile.colourspace('srgb')
+            return tile
+        
+        scroll = load(panels[0])
+        for path in panels[1:]:
+            scroll = scroll.join(
+                load(path), 'vertical',
+                expand=True, shim=spacing, background=background, align='centre'
+            )
+        
+        scroll.write_to_file(str(output_path))
+        print(f"✓ Vertical scroll saved: {output_path}")
+        print(f"  Size: {scroll.width}x{scroll.height}px")
+        return True
+    
     def export_video(
         self,
         panel_dir: Path,
@@ -158,20 +313,23 @@ class Exporter:
         """
         Export as video (vertical scroll animation)
         
-        Requires opencv-python
+        Uses ffmpeg when it's on PATH, otherwise requires opencv-python
         """
-        try:
-            import cv2
-        except ImportError:
-            print("✗ Video export requires opencv-python")
-            return False
-        
-        panels = sorted(panel_dir.glob("panel_*.png"))
+        panels = _panels_in(panel_dir)
         
         if not panels:
             print("✗ No panels found")
             return False
         
+        if shutil.which("ffmpeg"):
+            return self._export_video_ffmpeg(panels, output_path, duration_per_panel, fps)
+        
+        try:
+            import cv2
+        except ImportError:
+            print("✗ Video export requires ffmpeg or opencv-python")
+            return False
+        
         # Load first panel to get dimensions
         first_img = cv2.imread(str(panels[0]))
         height, width = first_img.shape[:2]
@@ -199,6 +357,51 @@ class Exporter:
         print(f"✓ Video saved: {output_path}")
         return True
     
+    def _export_video_ffmpeg(
+        self,
+        panels: List[Path],
+        output_path: Path,
+        duration_per_panel: float,
+        fps: int
+    ):
+        """
+        Encode the slideshow with ffmpeg's concat demuxer
+        
+        Each panel is decoded once and held for its duration by ffmpeg,
+        instead of being written frame-by-frame from Python.
+        """
+        def entry(path):
+            quoted = str(Path(path).resolve()).replace("'", "'\\''")
+            return f"file '{quoted}'\n"
+        
+        lines = [entry(p) + f"duration {duration_per_panel}\n" for p in panels]
+        lines.append(entry(panels[-1]))  # concat ignores the last duration otherwise
+        
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as f:
+            f.writelines(lines)
+            list_path = f.name
+        
+        try:
+            result = subprocess.run(
+                [
+                    "ffmpeg", "-y", "-loglevel", "error",
+                    "-f", "concat", "-safe", "0", "-i", list_path,
+                    "-vf", f"fps={fps},scale=trunc(iw/2)*2:trunc(ih/2)*2,format=yuv420p",
+                    "-c:v", "libx264", "-movflags", "+faststart",
+                    str(output_path)
+                ],
+                capture_output=True, text=True
+            )
+        finally:
+            os.unlink(list_path)
+        
+        if result.returncode != 0:
+            print(f"✗ ffmpeg failed: {result.stderr.strip()}")
+            return False
+        
+        print(f"✓ Video saved: {output_path}")
+        return True
+    
     def export_social_media(
         self,
         panel_dir: Path,
@@ -213,7 +416,7 @@ class Exporter:
         output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        panels = sorted(panel_dir.glob("panel_*.png"))
+        panels = _panels_in(panel_dir)
         
         # Platform specs
         specs = {
@@ -225,23 +428,28 @@ class Exporter:
         
         spec = specs.get(platform, specs["instagram"])
         
-        for idx, panel_path in enumerate(panels):
-            img = Image.open(panel_path)
-            
-            # Resize to platform specs (maintaining aspect ratio)
-            img.thumbnail((spec["width"], spec["height"]), Image.Resampling.LANCZOS)
-            
-            # Create canvas with platform size
-            canvas = Image.new('RGB', (spec["width"], spec["height"]), (0, 0, 0))
-            
-            # Center image
-            x_offset = (spec["width"] - img.width) // 2
-            y_offset = (spec["height"] - img.height) // 2
-            canvas.paste(img, (x_offset, y_offset))
+        def process(idx, panel_path):
+            with Image.open(panel_path) as img:
+                # Resize to platform specs (maintaining aspect ratio)
+                img.thumbnail((spec["width"], spec["height"]), Image.Resampling.LANCZOS)
+                
+                # Create canvas with platform size
+                canvas = Image.new('RGB', (spec["width"], spec["height"]), (0, 0, 0))
+                
+                # Center image
+                x_offset = (spec["width"] - img.width) // 2
+                y_offset = (spec["height"] - img.height) // 2
+                canvas.paste(img, (x_offset, y_offset))
             
             # Save
             output_file = output_dir / f"{platform}_{idx+1:03d}.{spec['format'].lower()}"
-            canvas.save(output_file, spec["format"], optimize=True)
+            # Fast zlib pass; optimize=True re-runs every filter for a few % smaller files
+            canvas.save(output_file, spec["format"], compress_level=1)
+        
+        # Panels are independent and PIL drops the GIL while resampling/encoding
+        if panels:
+            with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, len(panels))) as pool:
+                list(pool.map(process, range(len(panels)), panels))
         
         print(f"✓ Exported {len(panels)} panels for {platform}")
         print(f"  Location: {output_dir}")
@@ -2,21 +2,323 @@
 Enhanced Gemini integration for advanced image generation support
 """
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from dotenv import load_dotenv
-import google.generativeai as genai
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import json
+import re
+import time
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+from config import CACHE_DIR
+from prompt_cache import PromptCache, cache_key
 
-# Load environment
 env_path = Path(__file__).parent / '.env'
-load_dotenv(env_path)
 
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+# Per-request timeout, retries for transient API errors, and a circuit
+# breaker that skips Gemini for a while after repeated failures
+GEMINI_TIMEOUT = 15  # seconds
+GEMINI_RETRIES = 2
+GEMINI_BREAKER_FAILURES = 3
+GEMINI_BREAKER_COOLDOWN = 60  # seconds
+
+
+# Static instructions + JSON schema for each request type. They are sent as
+# the model's system instruction with only the per-call data appended after,
+# so the prefix stays byte-identical from call to call.
+COMPOSITION_SCHEMA = """{
+  "camera_angle": "eye-level/low-angle/high-angle/dutch-angle",
+  "framing": "close-up/medium-shot/wide-shot",
+  "focal_point": "what should be the focus",
+  "lighting": "dramatic/soft/bright/moody",
+  "mood": "tense/peaceful/exciting/sad",
+  "color_palette": "warm/cool/vibrant/muted",
+  "composition_notes": "brief advice"
+}"""
+
+PREFIX_COMPOSITION = f"""
+Analyze the scene and suggest optimal visual composition for a manhwa panel.
+
+Provide suggestions in JSON format:
+{COMPOSITION_SCHEMA}
+
+Respond with ONLY the JSON object.
+"""
+
+PREFIX_COMPOSITION_BATCH = f"""
+Analyze each numbered scene and suggest optimal visual composition for a
+manhwa panel showing it.
+
+Return a JSON array with one object per scene, in the same order as the
+scenes, each in this format:
+{COMPOSITION_SCHEMA}
+
+Respond with ONLY the JSON array.
+"""
+
+PREFIX_STYLE = """
+Based on the scene, suggest the best art style.
+
+Available styles:
+- manhwa: Korean webtoon style
+- manga: Japanese manga style
+- anime: Japanese anime style
+- realistic: Photorealistic
+- painterly: Digital painting
+- watercolor: Watercolor art
+
+Suggest in JSON:
+{
+  "primary_style": "style name",
+  "style_mix": {"style1": 0.7, "style2": 0.3},
+  "reasoning": "why this works",
+  "tags": ["tag1", "tag2"]
+}
+
+ONLY JSON response.
+"""
+
+PREFIX_QUALITY = """
+Analyze the panel description for visual quality.
+
+Rate and suggest improvements in JSON:
+{
+  "quality_score": 0-10,
+  "clarity": "how clear the prompt is",
+  "improvements": ["suggestion1", "suggestion2"],
+  "missing_elements": ["what's missing"],
+  "potential_issues": ["possible problems"]
+}
+
+ONLY JSON response.
+"""
+
+PREFIX_LAYOUT = """
+Suggest optimal panel layout for the numbered scenes.
+
+Provide layout in JSON:
+{
+  "layout_type": "3-panel/4-panel/dynamic",
+  "panel_arrangement": "vertical/horizontal/mixed",
+  "panel_sizes": ["large", "medium", "small"],
+  "emphasis": "which panel should be largest",
+  "flow": "reading order explanation"
+}
+
+ONLY JSON response.
+"""
+
+PREFIX_ENHANCE = """
+Enhance the image generation prompt with the characteristics of the given style.
+
+Add appropriate:
+- Visual style tags
+- Color palette descriptions
+- Artistic techniques
+- Quality enhancers
+
+Return ONLY the enhanced prompt text, no explanations.
+"""
+
+PREFIX_SPEECH_BUBBLE = """
+Format the dialogue for a manhwa speech bubble.
+
+Suggest in JSON:
+{
+  "formatted_text": "text with line breaks",
+  "bubble_style": "normal/thought/shout/whisper",
+  "font_suggestions": "bold/italic/normal",
+  "emphasis_words": ["words", "to", "emphasize"],
+  "sfx_suggestions": ["sound effects if any"]
+}
+
+ONLY JSON response.
+"""
+
+# Per-call data sent after each prefix; the template is the whole dynamic
+# suffix, so the prefix/suffix boundary never moves
+SUFFIX_COMPOSITION = "Scene: {scene}\nCharacter: {character}"
+SUFFIX_STYLE = "Scene: {scene}\nCurrent style: {style}"
+SUFFIX_QUALITY = "Description: {description}"
+SUFFIX_ENHANCE = "Style: {style}\nBase prompt: {prompt}\nMood: {mood}"
+SUFFIX_SPEECH_BUBBLE = "Dialogue: {dialogue}\nEmotion: {emotion}"
+
+
+class _JsonBlockScanner:
+    """
+    Incremental brace counter for the first balanced {...} or [...] block
+    
+    Text can be fed piece by piece as it streams in. Braces inside strings
+    (and escaped quotes) are skipped.
+    """
+    
+    def __init__(self):
+        self.text = ""
+        self.block = None
+        self._pos = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = self._escaped = False
+    
+    def feed(self, chunk: str) -> bool:
+        """Add text; returns True once a complete block has been seen"""
+        self.text += chunk
+        if self.block is not None:
+            return True
+        
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._start < 0:
+                if ch in '{[':
+                    self._start, self._depth = i, 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == '\\':
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self.block = text[self._start:i + 1]
+                    return True
+        self._pos = len(text)
+        return False
+
+
+def _extract_json(text: str) -> Optional[str]:
+    """
+    Cut the first balanced {...} or [...] block out of a reply
+    
+    Catches replies wrapped in prose or ``` fences despite the "ONLY JSON"
+    instruction.
+    """
+    scanner = _JsonBlockScanner()
+    scanner.feed(text)
+    return scanner.block
+
+
+def _json_loads(text: str):
+    """Parse a model reply, with orjson when installed"""
+    loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+    try:
+        return loads(text)
+    except ValueError:
+        # Salvage JSON wrapped in prose instead of making the caller retry
+        block = _extract_json(text)
+        if block is None or block == text:
+            raise
+        return loads(block)
+
 
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
+def _is_transient(error: Exception) -> bool:
+    """Errors worth retrying: timeouts, overload and server-side failures"""
+    if isinstance(error, TimeoutError):
+        return True
+    try:
+        from google.api_core import exceptions as api_exceptions
+    except ImportError:
+        return False
+    return isinstance(error, (
+        api_exceptions.DeadlineExceeded,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.InternalServerError,
+        api_exceptions.ResourceExhausted
+    ))
+
+
+def _character_names() -> Tuple[str, ...]:
+    """Names in the character library: the only words the structural cache swaps"""
+    try:
+        from character_manager import character_library  # Lazy import
+    except ImportError:
+        return ()
+    return tuple(sorted(e['name'] for e in character_library.list_characters() if e.get('name')))
+
+
+class _StructuralCache:
+    """
+    Reuse answers for scenes that differ only in which characters appear
+    
+    Scenes across a chapter often share structure ("Elena draws her sword"
+    vs "Mira draws her sword"). With known character names, requests are
+    keyed by a skeleton where each distinct name becomes a numbered
+    placeholder; on a hit the cached answer is returned with the old names
+    swapped for the new ones. Only library names are slots, so other words
+    ("Fire engulfed..." vs "Water engulfed...") always key separately.
+    Without names (the default) the key is the exact request.
+    """
+    
+    def __init__(self, cache: PromptCache):
+        self._cache = cache
+    
+    @staticmethod
+    @lru_cache(maxsize=8)
+    def _name_pattern(names: Tuple[str, ...]) -> Optional["re.Pattern"]:
+        if not names:
+            return None
+        # Longest first so "Mira" doesn't shadow "Mirabel"
+        alternation = "|".join(map(re.escape, sorted(names, key=len, reverse=True)))
+        return re.compile(r"(?<!\w)(?:%s)(?!\w)" % alternation)
+    
+    @classmethod
+    @lru_cache(maxsize=256)
+    def _skeleton(cls, prefix: str, text: str, names: Tuple[str, ...]) -> Tuple[str, Tuple[str, ...]]:
+        """Cache key and the distinct names in order; memoized since a miss is followed by set()"""
+        pattern = cls._name_pattern(names)
+        if pattern is None:
+            return cache_key(prefix, text), ()
+        
+        slots = {}
+        
+        def placeholder(match):
+            # The same name always gets the same placeholder, so "Elena ...
+            # Elena" and "Elena ... Mira" have different skeletons
+            index = slots.setdefault(match.group(0), len(slots))
+            return f"<NAME{index}>"
+        
+        skeleton = pattern.sub(placeholder, text)
+        return cache_key(prefix, skeleton), tuple(slots)
+    
+    def get(self, prefix: str, text: str, names: Tuple[str, ...] = ()) -> Optional[Dict]:
+        key, slots = self._skeleton(prefix, text, names)
+        hit = self._cache.get(key)
+        if hit is None:
+            return None
+        
+        # Same skeleton means the same number of distinct names, so this is
+        # one-to-one; a single regex pass keeps swaps (A<->B) correct
+        mapping = {old: new for old, new in zip(hit['slots'], slots) if old != new}
+        if not mapping:
+            return hit['response']
+        pattern = re.compile(r"(?<!\w)(?:%s)(?!\w)" % "|".join(map(re.escape, mapping)))
+        
+        def fill(value):
+            if isinstance(value, str):
+                return pattern.sub(lambda m: mapping[m.group(0)], value)
+            if isinstance(value, list):
+                return [fill(v) for v in value]
+            if isinstance(value, dict):
+                return {k: fill(v) for k, v in value.items()}
+            return value
+        
+        return fill(hit['response'])
+    
+    def set(self, prefix: str, text: str, response: Dict, names: Tuple[str, ...] = ()):
+        key, slots = self._skeleton(prefix, text, names)
+        self._cache.set(key, {'response': response, 'slots': list(slots)})
 
 
 class GeminiEnhanced:
@@ -24,12 +326,108 @@ class GeminiEnhanced:
     
     def __init__(self):
         self.model = None
-        if GEMINI_API_KEY:
-            self.model = genai.GenerativeModel(GEMINI_MODEL)
+        self._prefixed_models = {}
+        self._structural_cache = None
+        self._failures = 0
+        self._open_until = 0.0
+        
+        # dotenv and the Gemini SDK (gRPC, protobuf, auth) are only imported
+        # here, so importing this module stays cheap when Gemini isn't used
+        from dotenv import load_dotenv
+        load_dotenv(env_path)
+        
+        api_key = os.getenv('GEMINI_API_KEY')
+        self.model_name = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+        if api_key:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            self._genai = genai
+            self.model = genai.GenerativeModel(self.model_name)
+            self._structural_cache = _StructuralCache(PromptCache(CACHE_DIR / "gemini.sqlite"))
     
     def is_available(self) -> bool:
         return self.model is not None
     
+    def _generate(self, prefix: str, suffix: str, json_reply: bool = False) -> str:
+        """
+        Send the variable part of a request behind its static prefix
+        
+        JSON replies are streamed and reading stops as soon as the JSON
+        closes, so trailing fences or commentary are never waited for.
+        """
+        model = self._prefixed_models.get(prefix)
+        if model is None:
+            model = self._genai.GenerativeModel(self.model_name, system_instruction=prefix)
+            self._prefixed_models[prefix] = model
+        
+        request_options = {"timeout": GEMINI_TIMEOUT}
+        if not json_reply:
+            return model.generate_content(suffix, request_options=request_options).text.strip()
+        
+        scanner = _JsonBlockScanner()
+        for chunk in model.generate_content(suffix, stream=True, request_options=request_options):
+            if scanner.feed(chunk.text):
+                break
+        return scanner.block or scanner.text.strip()
+    
+    def _call_gemini(
+        self,
+        prefix: str,
+        suffix: str,
+        *,
+        default,
+        label: str,
+        parse_json: bool = True,
+        cache: bool = False,
+        structural: bool = False
+    ):
+        """
+        Run one Gemini request, returning default on any failure
+        
+        Transient API errors are retried with backoff. After repeated
+        failures Gemini is skipped for a cool-down, so a dead network costs
+        one timeout instead of one per call. With cache=True the response
+        cache is consulted first and filled on success; structural=True also
+        lets requests differing only in character names share an entry.
+        """
+        if not self.is_available():
+            return default
+        names = _character_names() if cache and structural else ()
+        if cache:
+            cached = self._structural_cache.get(prefix, suffix, names)
+            if cached is not None:
+                return cached
+        if time.monotonic() < self._open_until:
+            return default
+        
+        for attempt in range(GEMINI_RETRIES + 1):
+            try:
+                text = self._generate(prefix, suffix, json_reply=parse_json)
+                break
+            except Exception as e:
+                if attempt < GEMINI_RETRIES and _is_transient(e):
+                    time.sleep(2 ** attempt)
+                    continue
+                print(f"{label} failed: {e}")
+                self._failures += 1
+                if self._failures >= GEMINI_BREAKER_FAILURES:
+                    self._open_until = time.monotonic() + GEMINI_BREAKER_COOLDOWN
+                    print(f"⚠ Gemini failing repeatedly, skipping it for {GEMINI_BREAKER_COOLDOWN}s")
+                return default
+        self._failures = 0
+        
+        if not parse_json:
+            return text
+        try:
+            result = _json_loads(text)
+        except ValueError as e:
+            print(f"{label} failed: {e}")
+            return default
+        
+        if cache:
+            self._structural_cache.set(prefix, suffix, result, names)
+        return result
+    
     def suggest_composition(self, scene_text: str, character: str) -> Dict:
         """
         Get Gemini's suggestions for panel composition
@@ -43,36 +441,48 @@ class GeminiEnhanced:
                 'mood': str
             }
         """
+        prompt = SUFFIX_COMPOSITION.format(scene=scene_text, character=character)
+        return self._call_gemini(
+            PREFIX_COMPOSITION, prompt, default={}, label="Composition suggestion",
+            cache=True, structural=True
+        )
+    
+    def suggest_composition_batch(self, scenes: List[Tuple[str, str]]) -> List[Dict]:
+        """
+        Composition suggestions for many (scene_text, character) pairs
+        
+        Scenes not already answered by the cache go to Gemini in a single
+        request instead of one round-trip each.
+        
+        Returns:
+            One suggestion dict per scene, in order ({} where it failed)
+        """
         if not self.is_available():
-            return {}
+            return [{} for _ in scenes]
         
-        prompt = f"""
-Analyze this scene and suggest optimal visual composition for a manhwa panel:
-
-Scene: {scene_text}
-Character: {character}
-
-Provide suggestions in JSON format:
-{{
-  "camera_angle": "eye-level/low-angle/high-angle/dutch-angle",
-  "framing": "close-up/medium-shot/wide-shot",
-  "focal_point": "what should be the focus",
-  "lighting": "dramatic/soft/bright/moody",
-  "mood": "tense/peaceful/exciting/sad",
-  "color_palette": "warm/cool/vibrant/muted",
-  "composition_notes": "brief advice"
-}}
-
-Respond with ONLY the JSON object.
-"""
+        prompts = [
+            SUFFIX_COMPOSITION.format(scene=scene_text, character=character)
+            for scene_text, character in scenes
+        ]
+        names = _character_names()
+        results = [self._structural_cache.get(PREFIX_COMPOSITION, p, names) for p in prompts]
+        missing = [i for i, r in enumerate(results) if r is None]
         
-        try:
-            response = self.model.generate_content(prompt)
-            suggestions = json.loads(response.text.strip())
-            return suggestions
-        except Exception as e:
-            print(f"Composition suggestion failed: {e}")
-            return {}
+        if missing:
+            prompt = f"{len(missing)} scenes:\n\n" + "\n\n".join(
+                f"{n}. {prompts[i]}" for n, i in enumerate(missing, 1)
+            )
+            suggestions = self._call_gemini(
+                PREFIX_COMPOSITION_BATCH, prompt, default=None, label="Batch composition suggestion"
+            )
+            if isinstance(suggestions, list) and len(suggestions) == len(missing):
+                for i, suggestion in zip(missing, suggestions):
+                    results[i] = suggestion
+                    self._structural_cache.set(PREFIX_COMPOSITION, prompts[i], suggestion, names)
+            elif suggestions is not None:
+                print(f"Batch composition suggestion failed: expected {len(missing)} suggestions")
+        
+        return [r if r is not None else {} for r in results]
     
     def suggest_style(self, scene_text: str, current_style: str = "manhwa") -> Dict:
         """
@@ -85,41 +495,10 @@ Respond with ONLY the JSON object.
                 'reasoning': str
             }
         """
-        if not self.is_available():
-            return {}
-        
-        prompt = f"""
-Based on this scene, suggest the best art style:
-
-Scene: {scene_text}
-Current style: {current_style}
-
-Available styles:
-- manhwa: Korean webtoon style
-- manga: Japanese manga style
-- anime: Japanese anime style
-- realistic: Photorealistic
-- painterly: Digital painting
-- watercolor: Watercolor art
-
-Suggest in JSON:
-{{
-  "primary_style": "style name",
-  "style_mix": {{"style1": 0.7, "style2": 0.3}},
-  "reasoning": "why this works",
-  "tags": ["tag1", "tag2"]
-}}
-
-ONLY JSON response.
-"""
-        
-        try:
-            response = self.model.generate_content(prompt)
-            suggestions = json.loads(response.text.strip())
-            return suggestions
-        except Exception as e:
-            print(f"Style suggestion failed: {e}")
-            return {}
+        prompt = SUFFIX_STYLE.format(scene=scene_text, style=current_style)
+        return self._call_gemini(
+            PREFIX_STYLE, prompt, default={}, label="Style suggestion", cache=True
+        )
     
     def analyze_panel_quality(self, panel_description: str) -> Dict:
         """
@@ -127,33 +506,39 @@ ONLY JSON response.
         
         Returns quality score and suggestions
         """
+        prompt = SUFFIX_QUALITY.format(description=panel_description)
+        return self._call_gemini(
+            PREFIX_QUALITY, prompt, default={}, label="Quality analysis", cache=True
+        )
+    
+    def analyze_scene(
+        self,
+        scene_text: str,
+        character: str,
+        panel_description: Optional[str] = None
+    ) -> Dict:
+        """
+        Composition, style and quality suggestions for one scene
+        
+        The three requests are independent network calls, so they run on
+        threads and the scene costs the slowest request instead of the sum.
+        
+        Returns:
+            {'composition': dict, 'style': dict, 'quality': dict}
+        """
         if not self.is_available():
-            return {}
+            return {'composition': {}, 'style': {}, 'quality': {}}
         
-        prompt = f"""
-Analyze this panel description for visual quality:
-
-Description: {panel_description}
-
-Rate and suggest improvements in JSON:
-{{
-  "quality_score": 0-10,
-  "clarity": "how clear the prompt is",
-  "improvements": ["suggestion1", "suggestion2"],
-  "missing_elements": ["what's missing"],
-  "potential_issues": ["possible problems"]
-}}
-
-ONLY JSON response.
-"""
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            composition = pool.submit(self.suggest_composition, scene_text, character)
+            style = pool.submit(self.suggest_style, scene_text)
+            quality = pool.submit(self.analyze_panel_quality, panel_description or scene_text)
         
-        try:
-            response = self.model.generate_content(prompt)
-            analysis = json.loads(response.text.strip())
-            return analysis
-        except Exception as e:
-            print(f"Quality analysis failed: {e}")
-            return {}
+        return {
+            'composition': composition.result(),
+            'style': style.result(),
+            'quality': quality.result()
+        }
     
     def suggest_panel_layout(self, scenes: List[str]) -> Dict:
         """
@@ -166,35 +551,10 @@ ONLY JSON response.
                 'flow': 'reading order'
             }
         """
-        if not self.is_available():
-            return {}
-        
-        scenes_text = "\n".join([f"{i+1}. {s}" for i, s in enumerate(scenes)])
-        
-        prompt = f"""
-Suggest optimal panel layout for these scenes:
-
-{scenes_text}
-
-Provide layout in JSON:
-{{
-  "layout_type": "3-panel/4-panel/dynamic",
-  "panel_arrangement": "vertical/horizontal/mixed",
-  "panel_sizes": ["large", "medium", "small"],
-  "emphasis": "which panel should be largest",
-  "flow": "reading order explanation"
-}}
-
-ONLY JSON response.
-"""
-        
-        try:
-            response = self.model.generate_content(prompt)
-            layout = json.loads(response.text.strip())
-            return layout
-        except Exception as e:
-            print(f"Layout suggestion failed: {e}")
-            return {}
+        prompt = "\n".join([f"{i+1}. {s}" for i, s in enumerate(scenes)])
+        return self._call_gemini(
+            PREFIX_LAYOUT, prompt, default={}, label="Layout suggestion"
+        )
     
     def enhance_prompt_with_style(
         self, 
@@ -205,35 +565,13 @@ ONLY JSON response.
         """
         Enhance prompt with specific style characteristics
         """
-        if not self.is_available():
-            return base_prompt
-        
-        prompt = f"""
-Enhance this image generation prompt with {style} style characteristics:
-
-Base prompt: {base_prompt}
-Mood: {mood}
-
-Add appropriate:
-- Visual style tags
-- Color palette descriptions
-- Artistic techniques
-- Quality enhancers
-
-Return ONLY the enhanced prompt text, no explanations.
-"""
+        prompt = SUFFIX_ENHANCE.format(style=style, prompt=base_prompt, mood=mood)
+        enhanced = self._call_gemini(
+            PREFIX_ENHANCE, prompt, default=None, label="Prompt enhancement", parse_json=False
+        )
         
-        try:
-            response = self.model.generate_content(prompt)
-            enhanced = response.text.strip()
-            
-            # Remove quotes if present
-            enhanced = enhanced.strip('"\'')
-            
-            return enhanced
-        except Exception as e:
-            print(f"Prompt enhancement failed: {e}")
-            return base_prompt
+        # Remove quotes if present
+        return enhanced.strip('"\'') if enhanced else base_prompt
     
     def generate_speech_bubble_text(
         self, 
@@ -251,38 +589,23 @@ Return ONLY the enhanced prompt text, no explanations.
                 'emphasis': list
             }
         """
-        if not self.is_available():
-            return {'formatted_text': dialogue}
-        
-        prompt = f"""
-Format this dialogue for a manhwa speech bubble:
-
-Dialogue: {dialogue}
-Emotion: {character_emotion}
+        prompt = SUFFIX_SPEECH_BUBBLE.format(dialogue=dialogue, emotion=character_emotion)
+        return self._call_gemini(
+            PREFIX_SPEECH_BUBBLE, prompt, default={'formatted_text': dialogue},
+            label="Dialogue formatting", cache=True
+        )
 
-Suggest in JSON:
-{{
-  "formatted_text": "text with line breaks",
-  "bubble_style": "normal/thought/shout/whisper",
-  "font_suggestions": "bold/italic/normal",
-  "emphasis_words": ["words", "to", "emphasize"],
-  "sfx_suggestions": ["sound effects if any"]
-}}
 
-ONLY JSON response.
-"""
-        
-        try:
-            response = self.model.generate_content(prompt)
-            formatting = json.loads(response.text.strip())
-            return formatting
-        except Exception as e:
-            print(f"Dialogue formatting failed: {e}")
-            return {'formatted_text': dialogue}
+@lru_cache(maxsize=1)
+def get_gemini_enhanced() -> GeminiEnhanced:
+    """Shared instance, created (and the SDK imported) on first use"""
+    return GeminiEnhanced()
 
 
-# Global instance
-gemini_enhanced = GeminiEnhanced()
+def __getattr__(name: str):
+    if name == "gemini_enhanced":
+        return get_gemini_enhanced()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
@@ -6,6 +6,10 @@ from PIL import Image
 from pathlib import Path
 from typing import Optional, List, Tuple, Callable
 import gc
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import os
+import shutil
 
 # Heavy ML imports moved to load_pipeline() for lazy loading
 # This prevents 30-60 second startup delay
@@ -14,22 +18,49 @@ from config import (
     DEVICE, DTYPE, get_model_path,
     PANEL_WIDTH, PANEL_HEIGHT, DRAFT_WIDTH, DRAFT_HEIGHT,
     NUM_INFERENCE_STEPS, GUIDANCE_SCALE, DRAFT_STEPS,
-    ENABLE_ATTENTION_SLICING, ENABLE_VAE_SLICING,
-    FRAMES_DIR
+    ENABLE_ATTENTION_SLICING, ENABLE_VAE_SLICING, ENABLE_XFORMERS, ENABLE_TORCH_COMPILE,
+    PANEL_BATCH_SIZE, FRAMES_DIR, PANEL_CACHE_DIR, PANEL_CACHE_MAX_ENTRIES
 )
 
+
+def _trim_panel_cache(max_entries: int = PANEL_CACHE_MAX_ENTRIES):
+    """Keep the most recently used cached panels (mtime is refreshed on reuse)"""
+    try:
+        with os.scandir(PANEL_CACHE_DIR) as it:
+            entries = [(e.stat().st_mtime, e.path) for e in it if e.name.endswith(".png")]
+    except OSError:
+        return
+    if len(entries) <= max_entries:
+        return
+    entries.sort(reverse=True)
+    for _, path in entries[max_entries:]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
 class ManhwaGenerator:
     """Manages the Stable Diffusion pipeline for manhwa panel generation"""
     
     def __init__(self, draft_mode: bool = False):
         self.pipeline = None
         self.draft_mode = draft_mode
+        self.compiled = False
+        self._eager_modules = None
+        self._negative_embeds = {}  # negative prompt -> CLIP embedding
         
         # Use lazy device detection
         from config import get_device, get_dtype
         self.device = get_device()
         self.dtype = get_dtype()
         
+        self.set_mode(draft_mode)
+    
+    def set_mode(self, draft_mode: bool):
+        """Switch between draft and full-size output (no pipeline reload needed)"""
+        self.draft_mode = draft_mode
+        
         # Set dimensions based on mode
         if draft_mode:
             self.width = DRAFT_WIDTH
@@ -40,11 +71,32 @@ class ManhwaGenerator:
             self.height = PANEL_HEIGHT
             self.steps = NUM_INFERENCE_STEPS
         
+        self.batch_size = PANEL_BATCH_SIZE or self._default_batch_size()
+        
         print(f"Initializing generator: {self.width}x{self.height}, {self.steps} steps")
     
-    def load_pipeline(self):
+    def _default_batch_size(self) -> int:
+        """Pick how many panels to denoise per pipeline call from total VRAM"""
+        if self.device != "cuda":
+            return 1
+        
+        import torch
+        vram_gb = torch.cuda.get_device_properties(0).total_memory / 1024**3
+        if self.draft_mode:
+            vram_gb *= 4  # Draft panels are a quarter of the pixels
+        
+        if vram_gb >= 20:
+            return 4
+        if vram_gb >= 10:
+            return 2
+        return 1
+    
+    def load_pipeline(self, compile: Optional[bool] = None):
         """
         Load and configure the Stable Diffusion pipeline
+        
+        Args:
+            compile: torch.compile the UNet/VAE decoder (default: ENABLE_TORCH_COMPILE)
         """
         # Lazy import heavy ML libraries only when needed
         import torch
@@ -53,25 +105,64 @@ class ManhwaGenerator:
         
         print(f"\nLoading model on {self.device}...")
         model_path = get_model_path()
+        self._negative_embeds.clear()  # Embeddings belong to the old text encoder
         
         try:
-            # Load pipeline
-            self.pipeline = StableDiffusionPipeline.from_pretrained(
-                model_path,
+            # Load pipeline (half-precision weights when the repo ships them)
+            load_kwargs = dict(
                 torch_dtype=self.dtype,
                 safety_checker=None,  # Disable for speed
                 requires_safety_checker=False
             )
+            try:
+                if self.device != "cuda":
+                    raise ValueError("fp16 variant only used on CUDA")
+                self.pipeline = StableDiffusionPipeline.from_pretrained(
+                    model_path, variant="fp16", **load_kwargs
+                )
+            except (OSError, ValueError):
+                self.pipeline = StableDiffusionPipeline.from_pretrained(model_path, **load_kwargs)
             
             # Move to device
             self.pipeline = self.pipeline.to(self.device)
             
-            # Optimize for memory
-            if ENABLE_ATTENTION_SLICING:
+            # Inference only: no parameter ever needs a gradient
+            for module in (self.pipeline.unet, self.pipeline.vae, self.pipeline.text_encoder):
+                module.requires_grad_(False)
+            
+            if self.device == "cuda":
+                # Every panel has the same shape, so autotuned conv kernels are reused
+                torch.backends.cudnn.benchmark = True
+                self.pipeline.unet.to(memory_format=torch.channels_last)
+                self.pipeline.vae.to(memory_format=torch.channels_last)
+                print(f"[OK] Running in {str(self.dtype).replace('torch.', '')}, channels-last")
+            
+            # Memory-efficient attention (xFormers, else fused SDPA) is faster and
+            # leaner than slicing; slicing remains the fallback for CPU / older PyTorch
+            efficient_attention = False
+            if self.device == "cuda" and ENABLE_XFORMERS:
+                try:
+                    self.pipeline.enable_xformers_memory_efficient_attention()
+                    efficient_attention = True
+                    print("[OK] Using xFormers attention")
+                except Exception as e:
+                    print(f"[WARN] xFormers unavailable: {e}")
+            if (not efficient_attention and self.device == "cuda"
+                    and hasattr(torch.nn.functional, "scaled_dot_product_attention")):
+                from diffusers.models.attention_processor import AttnProcessor2_0
+                self.pipeline.unet.set_attn_processor(AttnProcessor2_0())
+                efficient_attention = True
+                print("[OK] Using PyTorch SDPA attention")
+            if not efficient_attention and ENABLE_ATTENTION_SLICING:
                 self.pipeline.enable_attention_slicing()
                 print("[OK] Enabled attention slicing")
             
-            if ENABLE_VAE_SLICING:
+            # Decoding a batch one image at a time only pays off on small GPUs
+            low_vram = (
+                self.device != "cuda"
+                or torch.cuda.get_device_properties(0).total_memory < 8 * 1024**3
+            )
+            if ENABLE_VAE_SLICING and low_vram:
                 self.pipeline.enable_vae_slicing()
                 print("[OK] Enabled VAE slicing")
             
@@ -81,6 +172,11 @@ class ManhwaGenerator:
             )
             print("[OK] Using DPM++ scheduler")
             
+            if compile is None:
+                compile = ENABLE_TORCH_COMPILE
+            if compile:
+                self._compile_pipeline()
+            
             print(f"[OK] Pipeline loaded successfully on {self.device}")
             
         except Exception as e:
@@ -91,6 +187,108 @@ class ManhwaGenerator:
             print("3. Try setting USE_LOCAL_MODEL = False in config.py to auto-download")
             raise
     
+    def _compile_pipeline(self):
+        """
+        Wrap the UNet and VAE decoder with torch.compile
+        
+        All panels share one resolution, so a static graph is traced once and
+        replayed (CUDA graphs via reduce-overhead) for every later panel.
+        """
+        import torch
+        
+        if self.device != "cuda" or not hasattr(torch, "compile"):
+            return
+        
+        try:
+            self._eager_modules = (self.pipeline.unet, self.pipeline.vae.decode)
+            self.pipeline.unet = torch.compile(
+                self.pipeline.unet, mode="reduce-overhead", fullgraph=True, dynamic=False
+            )
+            self.pipeline.vae.decode = torch.compile(self.pipeline.vae.decode, dynamic=False)
+            self.compiled = True
+            print("[OK] Compiled UNet and VAE decoder with torch.compile")
+        except Exception as e:
+            self._restore_eager()
+            print(f"[WARN] torch.compile unavailable, running eager: {e}")
+    
+    def _inference_context(self):
+        """
+        Autograd-free context for pipeline calls
+        
+        inference_mode skips version/view tracking, but some torch.compile
+        builds mis-handle graphs traced under it, so compiled pipelines use
+        plain no_grad instead.
+        """
+        import torch
+        return torch.no_grad() if self.compiled else torch.inference_mode()
+    
+    def _restore_eager(self):
+        """Swap compiled modules back to their eager versions"""
+        if self._eager_modules is not None:
+            self.pipeline.unet, self.pipeline.vae.decode = self._eager_modules
+            self._eager_modules = None
+        self.compiled = False
+    
+    def _encode_negative(self, negative_prompt: str):
+        """
+        CLIP embedding for a negative prompt, encoded once and reused
+        
+        Every panel in a chapter usually shares the same negative prompt,
+        so this saves a text-encoder pass per panel.
+        """
+        embeds = self._negative_embeds.get(negative_prompt)
+        if embeds is None:
+            with self._inference_context():
+                embeds, _ = self.pipeline.encode_prompt(
+                    negative_prompt, self.device, 1, do_classifier_free_guidance=False
+                )
+            self._negative_embeds[negative_prompt] = embeds
+        return embeds
+    
+    @staticmethod
+    def _to_pil(images) -> List[Image.Image]:
+        """
+        Convert the pipeline's [0, 1] image tensor batch to PIL images
+        
+        Quantizing to uint8 on the device means a quarter (fp32) or half
+        (fp16/bf16) of the bytes cross to the host, and the CPU skips the
+        float scaling diffusers' own PIL conversion does.
+        """
+        import torch  # Lazy import
+        
+        pixels = (images * 255).round().clamp(0, 255).to(torch.uint8)
+        pixels = pixels.permute(0, 2, 3, 1).contiguous().cpu().numpy()
+        return [Image.fromarray(p) for p in pixels]
+    
+    def warmup(self, steps: int = 2, batch_size: int = 1):
+        """
+        Run a short throwaway generation at the panel resolution
+        
+        Triggers torch.compile tracing (and CUDA/cuDNN setup) before the real
+        panels so that cost isn't paid inside the first panel. Falls back to
+        eager mode if compilation fails.
+        """
+        if self.pipeline is None:
+            raise RuntimeError("Pipeline not loaded. Call load_pipeline() first.")
+        
+        import torch  # Lazy import
+        
+        try:
+            with self._inference_context():
+                self.pipeline(
+                    prompt=["warmup"] * batch_size,
+                    width=self.width,
+                    height=self.height,
+                    num_inference_steps=steps,
+                    guidance_scale=GUIDANCE_SCALE
+                )
+            print("[OK] Pipeline warmed up")
+        except Exception as e:
+            if not self.compiled:
+                raise
+            print(f"[WARN] Compiled warmup failed, falling back to eager: {e}")
+            self._restore_eager()
+    
     def generate_panel(
         self,
         prompt: str,
@@ -121,25 +319,116 @@ class ManhwaGenerator:
             generator = torch.Generator(device=self.device).manual_seed(seed)
         
         # Generate
-        with torch.inference_mode():
+        with self._inference_context():
             output = self.pipeline(
                 prompt=prompt,
-                negative_prompt=negative_prompt,
+                negative_prompt_embeds=self._encode_negative(negative_prompt),
                 width=self.width,
                 height=self.height,
                 num_inference_steps=self.steps,
                 guidance_scale=GUIDANCE_SCALE,
                 generator=generator,
-                callback=progress_callback
+                callback=progress_callback,
+                output_type="pt"
             )
         
-        image = output.images[0]
+        # No empty_cache() here: it syncs the device and hands back blocks
+        # the allocator would immediately re-request for the next panel
+        return self._to_pil(output.images)[0]
+    
+    def generate_panels_batched(
+        self,
+        prompts: List[Tuple[str, str]],
+        seeds: Optional[List[int]] = None,
+        batch_size: Optional[int] = None,
+        on_batch: Optional[Callable[[int, List[Image.Image]], None]] = None
+    ) -> List[Image.Image]:
+        """
+        Generate several panels per pipeline call
+        
+        Args:
+            prompts: List of (positive, negative) prompt tuples
+            seeds: One seed per prompt (per-image generators keep results
+                identical to generating each panel on its own)
+            batch_size: Panels per call (default: self.batch_size)
+            on_batch: Called with (start_index, images) after each sub-batch
+            
+        Returns:
+            List of generated images, in prompt order
+        """
+        if self.pipeline is None:
+            raise RuntimeError("Pipeline not loaded. Call load_pipeline() first.")
+        
+        import torch  # Lazy import
+        
+        batch_size = max(1, batch_size or self.batch_size)
+        images = []
+        start = 0
         
-        # Clear cache
-        if self.device == "cuda":
-            torch.cuda.empty_cache()
+        # Split into columns once; each sub-batch is then plain list slices
+        # that the tokenizer encodes in one call
+        positives = [positive for positive, _ in prompts]
+        negatives = [negative for _, negative in prompts]
         
-        return image
+        while start < len(prompts):
+            end = min(start + batch_size, len(prompts))
+            count = end - start
+            
+            generators = None
+            if seeds is not None:
+                generators = [
+                    torch.Generator(device=self.device).manual_seed(seed)
+                    for seed in seeds[start:end]
+                ]
+            
+            chunk_negatives = negatives[start:end]
+            if chunk_negatives.count(chunk_negatives[0]) == count:
+                shared = self._encode_negative(chunk_negatives[0])
+                negative_kwargs = {'negative_prompt_embeds': shared.expand(count, -1, -1)}
+            else:
+                negative_kwargs = {'negative_prompt': chunk_negatives}
+            
+            try:
+                with self._inference_context():
+                    output = self.pipeline(
+                        prompt=positives[start:end],
+                        **negative_kwargs,
+                        width=self.width,
+                        height=self.height,
+                        num_inference_steps=self.steps,
+                        guidance_scale=GUIDANCE_SCALE,
+                        generator=generators,
+                        output_type="pt"
+                    )
+            except torch.cuda.OutOfMemoryError:
+                if batch_size == 1:
+                    raise
+                # Retry this sub-batch smaller and keep the smaller size
+                torch.cuda.empty_cache()
+                batch_size //= 2
+                self.batch_size = min(self.batch_size, batch_size)
+                print(f"[WARN] Out of GPU memory, retrying with batch size {batch_size}")
+                continue
+            
+            batch_images = self._to_pil(output.images)
+            images.extend(batch_images)
+            
+            if on_batch:
+                on_batch(start, batch_images)
+            start = end
+        
+        return images
+    
+    def _panel_cache_path(self, positive: str, negative: str, seed: int) -> Path:
+        """Content-addressed location of a previously generated panel"""
+        key = hashlib.blake2b(
+            "|".join(map(str, (
+                get_model_path(), self.dtype, self.width, self.height, self.steps,
+                GUIDANCE_SCALE, positive, negative, seed
+            ))).encode("utf-8"),
+            digest_size=16
+        ).hexdigest()
+        return PANEL_CACHE_DIR / f"{key}.png"
     
     def batch_generate(
         self,
@@ -149,7 +438,12 @@ class ManhwaGenerator:
         seed: Optional[int] = None
     ) -> List[Image.Image]:
         """
-        Generate multiple panels in sequence
+        Generate multiple panels, several per pipeline call
+        
+        With torch.compile enabled the first batch also pays the compile
+        cost unless warmup() ran first; later batches replay the graph.
+        Seeded panels are cached under PANEL_CACHE_DIR, so a rerun after a
+        chapter edit only generates the panels whose prompts changed.
         
         Args:
             prompts: List of (positive, negative) prompt tuples
@@ -160,44 +454,110 @@ class ManhwaGenerator:
         Returns:
             List of generated images
         """
+        from tqdm import tqdm
+        
         if output_dir is None:
             output_dir = FRAMES_DIR
         
         output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        images = []
+        # Per-panel seeds keep each image identical to generating it alone.
+        # They also make every (prompt, negative, seed) key unique, so two
+        # scenes with the same prompt still get distinct images and there
+        # is nothing to deduplicate within a run.
+        seeds = [seed + idx for idx in range(len(prompts))] if seed else None
         
-        print(f"\nGenerating {len(prompts)} panels...")
+        # Seeded panels are deterministic, so reruns can reuse earlier output
+        cache_paths = None
+        if seeds:
+            PANEL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            cache_paths = [
+                self._panel_cache_path(positive, negative, panel_seed)
+                for (positive, negative), panel_seed in zip(prompts, seeds)
+            ]
         
-        for idx, (positive, negative) in enumerate(tqdm(prompts, desc="Generating")):
-            # Calculate seed
-            current_seed = seed + idx if seed else None
+        images = [None] * len(prompts)
+        progress = tqdm(total=len(prompts), desc="Generating")
+        
+        if save_prompts:
+            from config import PROMPTS_DIR
+            PROMPTS_DIR.mkdir(parents=True, exist_ok=True)
+        
+        def save_prompt(idx: int):
+            if not save_prompts:
+                return
+            positive, negative = prompts[idx]
+            current_seed = seeds[idx] if seeds else None
+            # One buffer, one write (runs on the save pool for generated panels)
+            (PROMPTS_DIR / f"panel_{idx+1:03d}_prompt.txt").write_bytes(
+                f"POSITIVE PROMPT:\n{positive}\n\n"
+                f"NEGATIVE PROMPT:\n{negative}\n\n"
+                f"SEED: {current_seed}\n"
+                f"SIZE: {self.width}x{self.height}\n"
+                f"STEPS: {self.steps}\n".encode("utf-8")
+            )
+        
+        # Panels already in the cache are copied instead of generated
+        pending = []
+        for idx in range(len(prompts)):
+            if cache_paths is None or not cache_paths[idx].exists():
+                pending.append(idx)
+                continue
             
-            # Generate
-            print(f"\nPanel {idx + 1}/{len(prompts)}")
-            print(f"Prompt: {positive[:100]}...")
+            img_path = output_dir / f"panel_{idx+1:03d}.png"
+            shutil.copyfile(cache_paths[idx], img_path)
+            os.utime(cache_paths[idx])  # Mark as recently used for _trim_panel_cache
+            with Image.open(img_path) as cached:
+                cached.load()
+                images[idx] = cached
+            save_prompt(idx)
+            progress.update(1)
+        
+        if len(pending) < len(prompts):
+            progress.write(f"[OK] Reused {len(prompts) - len(pending)} cached panels")
+        print(f"\nGenerating {len(pending)} panels ({self.batch_size} per batch)...")
+        
+        def store(idx: int, image: Image.Image):
+            # Default zlib level: optimize=True's exhaustive search cost
+            # hundreds of ms per full-size panel for a few percent of size
+            img_path = output_dir / f"panel_{idx+1:03d}.png"
+            image.save(img_path, "PNG", compress_level=6)
+            progress.write(f"[OK] Saved: {img_path}")
             
-            image = self.generate_panel(positive, negative, current_seed)
-            images.append(image)
+            if cache_paths is not None:
+                tmp_path = cache_paths[idx].with_suffix(".tmp")
+                shutil.copyfile(img_path, tmp_path)
+                os.replace(tmp_path, cache_paths[idx])
             
-            # Save image
-            img_path = output_dir / f"panel_{idx+1:03d}.png"
-            image.save(img_path, "PNG", optimize=True)
-            print(f"[OK] Saved: {img_path}")
-            
-            # Save prompt
-            if save_prompts:
-                from config import PROMPTS_DIR
-                PROMPTS_DIR.mkdir(parents=True, exist_ok=True)
-                
-                prompt_path = PROMPTS_DIR / f"panel_{idx+1:03d}_prompt.txt"
-                with open(prompt_path, 'w', encoding='utf-8') as f:
-                    f.write(f"POSITIVE PROMPT:\n{positive}\n\n")
-                    f.write(f"NEGATIVE PROMPT:\n{negative}\n\n")
-                    f.write(f"SEED: {current_seed}\n")
-                    f.write(f"SIZE: {self.width}x{self.height}\n")
-                    f.write(f"STEPS: {self.steps}\n")
+            save_prompt(idx)
+        
+        # PNG encoding releases the GIL, so saves overlap the next batch on the GPU
+        io_pool = ThreadPoolExecutor(max_workers=2)
+        saves = []
+        
+        def save_batch(start: int, batch_images: List[Image.Image]):
+            for idx, image in zip(pending[start:], batch_images):
+                images[idx] = image
+                saves.append(io_pool.submit(store, idx, image))
+            progress.update(len(batch_images))
+        
+        try:
+            if pending:
+                self.generate_panels_batched(
+                    [prompts[idx] for idx in pending],
+                    [seeds[idx] for idx in pending] if seeds else None,
+                    on_batch=save_batch
+                )
+        finally:
+            io_pool.shutdown(wait=True)
+            progress.close()
+        
+        for save in saves:
+            save.result()  # Surface any save error
+        
+        if cache_paths is not None:
+            _trim_panel_cache()
         
         print(f"\n[OK] Generated {len(images)} panels")
         return images
@@ -207,6 +567,7 @@ class ManhwaGenerator:
         if self.pipeline is not None:
             del self.pipeline
             self.pipeline = None
+            self._negative_embeds.clear()
             
             if self.device == "cuda":
                 import torch  # Lazy import
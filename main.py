@@ -6,6 +6,7 @@ Converts novel chapter text into vertical manhwa panels using Stable Diffusion.
 """
 import argparse
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 import colorama
@@ -38,6 +39,12 @@ def print_banner():
     print(banner)
 
 
+def load_and_warm(generator: ManhwaGenerator):
+    """Load the pipeline and trace its torch.compile graphs before the first panel"""
+    generator.load_pipeline()
+    generator.warmup(batch_size=generator.batch_size)
+
+
 def main():
     """Main application flow"""
     print_banner()
@@ -110,6 +117,12 @@ def main():
     # Save scene breakdown
     parser_obj.save_scenes(OUTPUT_DIR / "scenes.txt")
     
+    # Start loading (and compiling) the SD pipeline now so it overlaps with
+    # the Gemini character detection and prompt building below
+    generator = ManhwaGenerator(draft_mode=args.draft)
+    loader = ThreadPoolExecutor(max_workers=1)
+    pipeline_ready = loader.submit(load_and_warm, generator)
+    
     # Setup character
     print(f"\n{Fore.YELLOW}[4/7] Loading character profile...{Style.RESET_ALL}")
     char_manager = CharacterManager()
@@ -131,9 +144,9 @@ def main():
                     character = CharacterProfile(char_info.get('name', 'protagonist'))
                     character.gender = char_info.get('gender', 'unknown')
                     character.age = char_info.get('age', 'young adult')
-                    character.hair = char_info.get('hair', 'default hair')
-                    character.eyes = char_info.get('eyes', 'default eyes')
-                    character.outfit = char_info.get('outfit', 'default outfit')
+                    character.hair_color = char_info.get('hair', '')
+                    character.eye_color = char_info.get('eyes', '')
+                    character.default_outfit = char_info.get('outfit', '')
                     character.vibe = char_info.get('vibe', 'neutral expression')
                     char_manager.add_character(character)
                     print(f"{Fore.GREEN}✓ Auto-detected character: {character.name}{Style.RESET_ALL}")
@@ -170,10 +183,8 @@ def main():
     if args.draft:
         print(f"{Fore.CYAN}  Running in DRAFT mode (faster, lower quality){Style.RESET_ALL}")
     
-    generator = ManhwaGenerator(draft_mode=args.draft)
-    
     try:
-        generator.load_pipeline()
+        pipeline_ready.result()
         
         # Generate all panels
         start_time = datetime.now()
@@ -197,6 +208,7 @@ def main():
         return 1
     
     finally:
+        loader.shutdown()
         generator.unload()
     
     # Post-process
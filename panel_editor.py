@@ -2,12 +2,50 @@
 Panel Editor - Preview and edit prompts before generation
 """
 from typing import List, Dict, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from pathlib import Path
 import json
+import re
+import sys
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
-@dataclass
+
+def _dumps(data: Dict) -> bytes:
+    """Serialize to indented UTF-8 JSON (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2).encode('utf-8')
+
+
+def _loads(raw: bytes) -> Dict:
+    """Parse JSON bytes (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+# No per-instance __dict__ for panels where dataclass supports it (3.10+)
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# Tags appended to a panel prompt by apply_style_preset
+_STYLE_TAGS = {
+    'manhwa': 'manhwa style, korean webtoon, digital art, vibrant colors',
+    'manga': 'manga style, black and white, screentones, japanese comic',
+    'anime': 'anime style, cel shading, vibrant, japanese animation',
+    'realistic': 'photorealistic, detailed, cinematic lighting, realistic',
+    'watercolor': 'watercolor painting, soft colors, artistic, painterly',
+    'dark_fantasy': 'dark fantasy, gothic, dramatic lighting, mysterious',
+    'chibi': 'chibi style, cute, super deformed, big eyes, kawaii',
+    'western': 'western comic book style, bold lines, dynamic, marvel style'
+}
+
+
+@dataclass(**_SLOTS)
 class PanelPrompt:
     """Individual panel with editable prompt"""
     panel_id: int
@@ -45,6 +83,9 @@ class PanelPrompt:
     
     @classmethod
     def from_dict(cls, data: Dict):
+        # Files written by to_dict carry every field: unpack them in one call
+        if data.keys() == _PANEL_FIELDS:
+            return cls(**data)
         return cls(
             panel_id=data['panel_id'],
             scene_text=data['scene_text'],
@@ -59,12 +100,19 @@ class PanelPrompt:
         )
 
 
+_PANEL_FIELDS = frozenset(f.name for f in fields(PanelPrompt))
+
+
 class PanelEditor:
     """Manage panel editing workflow"""
     
     def __init__(self):
         self.panels: List[PanelPrompt] = []
         self.current_panel = 0
+        self._by_id: Dict[int, PanelPrompt] = {}
+    
+    def _reindex(self):
+        self._by_id = {panel.panel_id: panel for panel in self.panels}
     
     def create_panels_from_scenes(
         self,
@@ -82,6 +130,18 @@ class PanelEditor:
         """
         self.panels = []
         
+        # One case-insensitive alternation finds every character name in a
+        # scene in a single pass (longest first so "Anna" doesn't shadow "Anna Lee")
+        # Names are lowercased once here rather than per scene
+        characters = list(character_library.characters.values()) if character_library else []
+        lowered = [(c.name.lower(), c.character_id) for c in characters if c.name]
+        names = sorted({c.name for c in characters if c.name}, key=len, reverse=True)
+        name_pattern = None
+        if names:
+            name_pattern = re.compile(
+                r'(?<!\w)(?:' + '|'.join(map(re.escape, names)) + r')(?!\w)', re.IGNORECASE
+            )
+        
         for idx, scene in enumerate(scenes):
             # Build initial prompt
             if hasattr(scene, 'to_dict'):
@@ -109,21 +169,26 @@ class PanelEditor:
             )
             
             # Auto-detect characters if library provided
-            if character_library:
-                for char in character_library.characters.values():
-                    if char.name.lower() in scene_text.lower():
-                        panel.character_ids.append(char.character_id)
+            if name_pattern:
+                found = {name.lower() for name in name_pattern.findall(scene_text)}
+                if found:
+                    panel.character_ids = [
+                        char_id for name, char_id in lowered if name in found
+                    ]
             
             self.panels.append(panel)
         
+        self._reindex()
         return self.panels
     
     def get_panel(self, panel_id: int) -> Optional[PanelPrompt]:
         """Get panel by ID"""
-        for panel in self.panels:
-            if panel.panel_id == panel_id:
-                return panel
-        return None
+        panel = self._by_id.get(panel_id)
+        if panel is None and len(self._by_id) != len(self.panels):
+            # self.panels was replaced directly; rebuild the lookup
+            self._reindex()
+            panel = self._by_id.get(panel_id)
+        return panel
     
     def update_panel(
         self,
@@ -176,22 +241,10 @@ class PanelEditor:
         if not panel:
             return False
         
-        style_tags = {
-            'manhwa': 'manhwa style, korean webtoon, digital art, vibrant colors',
-            'manga': 'manga style, black and white, screentones, japanese comic',
-            'anime': 'anime style, cel shading, vibrant, japanese animation',
-            'realistic': 'photorealistic, detailed, cinematic lighting, realistic',
-            'watercolor': 'watercolor painting, soft colors, artistic, painterly',
-            'dark_fantasy': 'dark fantasy, gothic, dramatic lighting, mysterious',
-            'chibi': 'chibi style, cute, super deformed, big eyes, kawaii',
-            'western': 'western comic book style, bold lines, dynamic, marvel style'
-        }
-        
-        style = style_tags.get(style_name, '')
+        style = _STYLE_TAGS.get(style_name, '')
         
         if style:
-            current = panel.get_final_prompt()
-            panel.edited_prompt = f"{current}, {style}"
+            panel.edited_prompt = ", ".join((panel.get_final_prompt(), style))
             return True
         
         return False
@@ -222,16 +275,17 @@ class PanelEditor:
             'current_panel': self.current_panel
         }
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        with open(filepath, 'wb') as f:
+            f.write(_dumps(data))
     
     def load(self, filepath: str):
         """Load panel configuration"""
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(filepath, 'rb') as f:
+            data = _loads(f.read())
         
         self.panels = [PanelPrompt.from_dict(p) for p in data['panels']]
         self.current_panel = data.get('current_panel', 0)
+        self._reindex()
 
 
 if __name__ == "__main__":
@@ -1,13 +1,85 @@
 """
 Post-processing and panel composition utilities
 """
-from PIL import Image
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple
+from typing import TYPE_CHECKING, List, Tuple
 import json
+import os
+import re
 
 from config import FRAMES_DIR, OUTPUT_DIR
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# PIL/numpy are imported where used so metadata-only callers don't pay for them
+if TYPE_CHECKING:
+    from PIL import Image
+
+_PANEL_NAME_RE = re.compile(r'panel_(\d+)\.png$')
+
+
+def _scan_panels(panel_dir: Path) -> List[Path]:
+    """Panel PNGs in numeric order (panel_10 after panel_9) from one scandir pass"""
+    with os.scandir(panel_dir) as it:
+        entries = [(int(m.group(1)), e.path) for e in it if (m := _PANEL_NAME_RE.match(e.name))]
+    entries.sort()
+    return [Path(p) for _, p in entries]
+
+
+def preview_jpeg_path(panel_path: Path) -> Path:
+    """Lossy sidecar of a panel PNG used only to build previews (see _load_scaled)"""
+    return panel_path.with_name(f"{panel_path.stem}_preview.jpg")
+
+
+def _preview_source(panel_path: Path) -> Path:
+    """Prefer the JPEG sidecar (much cheaper to decode) when it's not stale"""
+    jpeg_path = preview_jpeg_path(panel_path)
+    try:
+        if jpeg_path.stat().st_mtime >= panel_path.stat().st_mtime:
+            return jpeg_path
+    except OSError:
+        pass
+    return panel_path
+
+
+def _load_scaled(panel_path: Path, scale_factor: float) -> "Image.Image":
+    """
+    Decode one panel as RGB, downscaled by scale_factor if below 1
+    
+    The first preview of a panel decodes the PNG and leaves a full-size
+    JPEG sidecar next to it; later previews decode that instead. Writing it
+    here keeps the encode out of the generation loop.
+    """
+    from PIL import Image  # Lazy import
+    
+    source = _preview_source(panel_path)
+    with Image.open(source) as img:
+        img = img.convert('RGB')
+    if source == panel_path:
+        # Baseline (not progressive) JPEG: fastest to decode. Temp file +
+        # replace so a concurrent preview never reads a partial sidecar.
+        jpeg_path = preview_jpeg_path(panel_path)
+        tmp_path = jpeg_path.with_name(jpeg_path.name + '.tmp')
+        try:
+            img.save(tmp_path, "JPEG", quality=85)
+            os.replace(tmp_path, jpeg_path)
+        except OSError:
+            pass
+    if scale_factor < 1:
+        img = img.resize(
+            (int(img.width * scale_factor), int(img.height * scale_factor)),
+            Image.Resampling.BILINEAR,
+            reducing_gap=2.0
+        )
+    return img
+
+
 class PostProcessor:
     """Handle post-processing of generated panels"""
     
@@ -31,8 +103,8 @@ class PostProcessor:
         if output_path is None:
             output_path = OUTPUT_DIR / "vertical_preview.png"
         
-        # Get all panel images sorted by name
-        panel_files = sorted(panel_dir.glob("panel_*.png"))
+        # Get all panel images in panel order
+        panel_files = _scan_panels(panel_dir) if Path(panel_dir).is_dir() else []
         
         if not panel_files:
             print("⚠ No panels found to create preview")
@@ -40,40 +112,53 @@ class PostProcessor:
         
         print(f"\nCreating vertical preview from {len(panel_files)} panels...")
         
-        # Load all images
-        images = [Image.open(f) for f in panel_files]
+        from PIL import Image  # Lazy import
+        import numpy as np
         
-        # Calculate dimensions
-        widths, heights = zip(*(img.size for img in images))
+        # Sizes from headers only (Image.open doesn't decode pixels)
+        sizes = []
+        for f in panel_files:
+            with Image.open(f) as img:
+                sizes.append(img.size)
+        scale_factor = min(1.0, max_width / max(w for w, _ in sizes))
+        if scale_factor < 1:
+            sizes = [(int(w * scale_factor), int(h * scale_factor)) for w, h in sizes]
         
-        # Scale if needed
-        if max(widths) > max_width:
-            scale_factor = max_width / max(widths)
-            images = [
-                img.resize(
-                    (int(img.width * scale_factor), int(img.height * scale_factor)),
-                    Image.Resampling.LANCZOS
-                )
-                for img in images
-            ]
-            widths, heights = zip(*(img.size for img in images))
+        total_height = sum(h for _, h in sizes)
+        canvas_width = max(w for w, _ in sizes)
         
-        # Create canvas
-        total_height = sum(heights)
-        canvas_width = max(widths)
+        # Preallocate the output and paste each panel as it arrives, so only
+        # a few decoded panels are alive at once. Narrower panels are
+        # centered on white margins.
+        canvas = np.full((total_height, canvas_width, 3), 255, dtype=np.uint8)
         
-        preview = Image.new('RGB', (canvas_width, total_height), (255, 255, 255))
+        # Decode + resize (+ sidecar encode) in parallel; PIL releases the GIL.
+        # Preview quality, so the cheap 2-tap filter is enough and
+        # reducing_gap lets PIL box-reduce first on big downscales.
+        workers = min(len(panel_files), os.cpu_count() or 1)
+        y = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            files = iter(panel_files)
+            for f in files:
+                pending.append(pool.submit(_load_scaled, f, scale_factor))
+                if len(pending) >= workers * 2:
+                    break
+            while pending:
+                img = pending.popleft().result()
+                x = (canvas_width - img.width) // 2
+                canvas[y:y + img.height, x:x + img.width] = np.asarray(img)
+                y += img.height
+                img.close()
+                next_file = next(files, None)
+                if next_file is not None:
+                    pending.append(pool.submit(_load_scaled, next_file, scale_factor))
         
-        # Paste panels
-        current_y = 0
-        for img in images:
-            # Center horizontally if image is narrower than canvas
-            x_offset = (canvas_width - img.width) // 2
-            preview.paste(img, (x_offset, current_y))
-            current_y += img.height
+        preview = Image.fromarray(canvas)
+        del canvas
         
-        # Save
-        preview.save(output_path, "PNG", optimize=True)
+        # Save (throwaway artifact, so favour encode speed over size)
+        preview.save(output_path, "PNG", compress_level=3)
         print(f"✓ Saved vertical preview: {output_path}")
         print(f"  Dimensions: {canvas_width}x{total_height}px")
         
@@ -83,7 +168,7 @@ class PostProcessor:
     def create_thumbnail(
         image_path: Path,
         size: Tuple[int, int] = (270, 480)
-    ) -> Image.Image:
+    ) -> "Image.Image":
         """
         Create a thumbnail of a panel
         
@@ -94,6 +179,8 @@ class PostProcessor:
         Returns:
             PIL Image thumbnail
         """
+        from PIL import Image  # Lazy import
+        
         img = Image.open(image_path)
         img.thumbnail(size, Image.Resampling.LANCZOS)
         return img
@@ -112,12 +199,15 @@ class PostProcessor:
         """
         # Save metadata as JSON sidecar
         json_path = image_path.with_suffix('.json')
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        if ORJSON_AVAILABLE:
+            data = orjson.dumps(metadata, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        else:
+            data = json.dumps(metadata, indent=2, ensure_ascii=False).encode('utf-8')
+        json_path.write_bytes(data)
     
     @staticmethod
     def create_grid(
-        images: List[Image.Image],
+        images: List["Image.Image"],
         cols: int = 3,
         output_path: Path = None
     ) -> Path:
@@ -138,6 +228,9 @@ class PostProcessor:
         if not images:
             return None
         
+        from PIL import Image  # Lazy import
+        import numpy as np
+        
         # Calculate grid dimensions
         rows = (len(images) + cols - 1) // cols
         
@@ -149,7 +242,8 @@ class PostProcessor:
         grid_width = max_width * cols
         grid_height = max_height * rows
         
-        grid = Image.new('RGB', (grid_width, grid_height), (240, 240, 240))
+        # Blit into one preallocated array (a row-wise memcpy per image)
+        grid = np.full((grid_height, grid_width, 3), 240, dtype=np.uint8)
         
         # Place images
         for idx, img in enumerate(images):
@@ -163,9 +257,14 @@ class PostProcessor:
             x_offset = (max_width - img.width) // 2
             y_offset = (max_height - img.height) // 2
             
-            grid.paste(img, (x + x_offset, y + y_offset))
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            y += y_offset
+            x += x_offset
+            grid[y:y + img.height, x:x + img.width] = np.asarray(img)
         
-        grid.save(output_path, "PNG", optimize=True)
+        # Default zlib level; optimize=True's exhaustive search dominated the save
+        Image.fromarray(grid).save(output_path, "PNG", compress_level=6)
         print(f"✓ Saved grid: {output_path}")
         
         return output_path
@@ -2,11 +2,53 @@
 Project Manager - Handle multiple manhwa projects
 """
 from pathlib import Path
+import hashlib
 import json
+import os
+import threading
 from datetime import datetime
 from typing import List, Dict, Optional
 import shutil
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _dumps(data: Dict) -> bytes:
+    """Serialize to indented UTF-8 JSON (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2).encode('utf-8')
+
+
+def _loads(raw: bytes) -> Dict:
+    """Parse JSON bytes (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _clone_file(src: str, dst: Path):
+    """Copy a file, letting the kernel reflink/offload it where supported"""
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining <= 0:
+                return
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+
+
 class ManhwaProject:
     """Represents a single manhwa project"""
     
@@ -55,11 +97,58 @@ class ManhwaProject:
 
 
 class ProjectManager:
-    """Manage multiple manhwa projects"""
+    """
+    Manage multiple manhwa projects
+    
+    The project list only shows a few fields, so those are kept in a small
+    index.json (updated on save/delete) instead of parsing every project.
+    """
+    
+    INDEX_FILE = "index.json"
     
     def __init__(self, projects_dir: str = "projects"):
         self.projects_dir = Path(projects_dir)
         self.projects_dir.mkdir(exist_ok=True)
+        self._index_lock = threading.Lock()
+        # Content digest (ignoring updated_at) of each project as last saved/loaded
+        self._saved_digests: Dict[str, bytes] = {}
+    
+    @staticmethod
+    def _content_digest(data: Dict) -> bytes:
+        return hashlib.blake2b(_dumps({**data, 'updated_at': None}), digest_size=16).digest()
+    
+    @staticmethod
+    def _index_entry(data: Dict) -> Dict:
+        return {
+            'project_id': data['project_id'],
+            'title': data.get('title', 'Untitled'),
+            'created_at': data.get('created_at', ''),
+            'updated_at': data.get('updated_at', ''),
+            'panel_count': len(data.get('generated_panels', []))
+        }
+    
+    def _read_index(self) -> Dict[str, Dict]:
+        try:
+            return _loads((self.projects_dir / self.INDEX_FILE).read_bytes())
+        except (OSError, ValueError):
+            return {}
+    
+    def _write_index(self, index: Dict[str, Dict]):
+        index_path = self.projects_dir / self.INDEX_FILE
+        tmp_path = index_path.with_name(index_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(_dumps(index))
+        os.replace(tmp_path, index_path)
+    
+    def _update_index(self, project_id: str, entry: Optional[Dict]):
+        """Set (or with None, drop) one project's index entry"""
+        with self._index_lock:
+            index = self._read_index()
+            if entry is None:
+                index.pop(project_id, None)
+            else:
+                index[project_id] = entry
+            self._write_index(index)
     
     def create_project(self, title: str) -> ManhwaProject:
         """Create a new project"""
@@ -79,12 +168,23 @@ class ProjectManager:
         return project
     
     def save_project(self, project: ManhwaProject):
-        """Save project to disk"""
-        project.updated_at = datetime.now().isoformat()
+        """Save project to disk (skipped when nothing but the timestamp would change)"""
         project_file = self.projects_dir / project.project_id / 'project.json'
         
-        with open(project_file, 'w', encoding='utf-8') as f:
-            json.dump(project.to_dict(), f, indent=2)
+        data = project.to_dict()
+        digest = self._content_digest(data)
+        if self._saved_digests.get(project.project_id) == digest and project_file.exists():
+            return
+        
+        project.updated_at = data['updated_at'] = datetime.now().isoformat()
+        
+        # Write-then-rename so a crash never leaves a torn project.json
+        tmp_path = project_file.with_name(project_file.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(_dumps(data))
+        os.replace(tmp_path, project_file)
+        self._saved_digests[project.project_id] = digest
+        self._update_index(project.project_id, self._index_entry(data))
     
     def load_project(self, project_id: str) -> Optional[ManhwaProject]:
         """Load project from disk"""
@@ -93,28 +193,35 @@ class ProjectManager:
         if not project_file.exists():
             return None
         
-        with open(project_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(project_file, 'rb') as f:
+            data = _loads(f.read())
         
-        return ManhwaProject.from_dict(data)
+        project = ManhwaProject.from_dict(data)
+        self._saved_digests[project_id] = self._content_digest(project.to_dict())
+        return project
     
     def list_projects(self) -> List[Dict]:
         """List all projects"""
-        projects = []
-        
-        for project_dir in self.projects_dir.iterdir():
-            if project_dir.is_dir():
-                project_file = project_dir / 'project.json'
+        with self._index_lock:
+            index = self._read_index()
+            on_disk = {entry.name for entry in os.scandir(self.projects_dir) if entry.is_dir()}
+            changed = False
+            
+            # Drop removed projects; only projects the index doesn't know yet
+            # (first run, or copied in by hand) get their project.json parsed
+            for project_id in index.keys() - on_disk:
+                del index[project_id]
+                changed = True
+            for project_id in on_disk - index.keys():
+                project_file = self.projects_dir / project_id / 'project.json'
                 if project_file.exists():
-                    with open(project_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        projects.append({
-                            'project_id': data['project_id'],
-                            'title': data.get('title', 'Untitled'),
-                            'created_at': data.get('created_at', ''),
-                            'updated_at': data.get('updated_at', ''),
-                            'panel_count': len(data.get('generated_panels', []))
-                        })
+                    index[project_id] = self._index_entry(_loads(project_file.read_bytes()))
+                    changed = True
+            
+            if changed:
+                self._write_index(index)
+        
+        projects = list(index.values())
         
         # Sort by updated_at (newest first)
         projects.sort(key=lambda x: x.get('updated_at', ''), reverse=True)
@@ -127,6 +234,8 @@ class ProjectManager:
         
         if project_dir.exists():
             shutil.rmtree(project_dir)
+            self._saved_digests.pop(project_id, None)
+            self._update_index(project_id, None)
             return True
         
         return False
@@ -156,9 +265,14 @@ class ProjectManager:
         old_char_dir = self.projects_dir / project_id / 'characters'
         new_char_dir = self.projects_dir / new_project.project_id / 'characters'
         
+        # Copies rather than hard links: reference images are overwritten in
+        # place, which would leak edits into the other project
         if old_char_dir.exists():
-            for img in old_char_dir.glob('*'):
-                shutil.copy(img, new_char_dir / img.name)
+            new_char_dir.mkdir(parents=True, exist_ok=True)
+            with os.scandir(old_char_dir) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        _clone_file(entry.path, new_char_dir / entry.name)
         
         return new_project
 
@@ -2,6 +2,7 @@
 Prompt building system for manhwa-style image generation
 """
 import random
+import re
 from typing import Optional, List
 from text_processor import Scene
 from character_manager import CharacterProfile
@@ -10,6 +11,18 @@ from config import (
     LIGHTING_MOODS
 )
 
+_DIALOGUE_RE = re.compile(r'"[^"]*"')
+_SENT_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Lighting that matches a detected scene mood
+_MOOD_LIGHTING = {
+    "tense": "dramatic lighting, deep shadows",
+    "peaceful": "soft natural light, warm tones",
+    "exciting": "cinematic lighting, vibrant colors",
+    "sad": "moody shadows, desaturated colors",
+    "angry": "harsh lighting, high contrast"
+}
+
 class PromptBuilder:
     """Build optimized prompts for manhwa panel generation"""
     
@@ -44,21 +57,13 @@ class PromptBuilder:
                 from ai_helper import ai_helper
                 
                 if ai_helper.is_available() and character:
-                    char_desc = character.get_description()
                     enhanced = ai_helper.enhance_prompt(
                         self.base_style,
                         scene.text
                     )
                     
-                    # Add character description if not present
-                    if char_desc not in enhanced:
-                        enhanced = f"{enhanced}, {char_desc}"
-                    
-                    # Add quality tags
-                    enhanced += ", vertical webtoon panel, masterpiece, best quality, sharp focus"
-                    
                     print(f"[OK] AI enhanced prompt for scene {scene.index}")
-                    return enhanced
+                    return self._finish_enhanced(enhanced, character.get_description())
             except Exception as e:
                 print(f"⚠ Prompt enhancement failed, using template: {e}")
         
@@ -80,14 +85,9 @@ class PromptBuilder:
         
         # 3. Lighting (match to mood)
         if lighting is None:
-            mood_lighting_map = {
-                "tense": "dramatic lighting, deep shadows",
-                "peaceful": "soft natural light, warm tones",
-                "exciting": "cinematic lighting, vibrant colors",
-                "sad": "moody shadows, desaturated colors",
-                "angry": "harsh lighting, high contrast"
-            }
-            lighting = mood_lighting_map.get(scene.mood, random.choice(LIGHTING_MOODS))
+            # Always draw the fallback so seeded runs consume the same random
+            # stream whether or not the mood is mapped
+            lighting = _MOOD_LIGHTING.get(scene.mood, random.choice(LIGHTING_MOODS))
         prompt_parts.append(lighting)
         
         # 4. Character description
@@ -113,6 +113,18 @@ class PromptBuilder:
         
         return final_prompt
     
+    def _finish_enhanced(self, enhanced: str, char_desc: str) -> str:
+        """Add the character description (if missing) and quality tags to an AI prompt"""
+        parts = [enhanced]
+        
+        # Add character description if not present
+        if char_desc not in enhanced:
+            parts.append(char_desc)
+        
+        # Add quality tags
+        parts += ["vertical webtoon panel", "masterpiece, best quality, sharp focus"]
+        return ", ".join(parts)
+    
     def _extract_visual_elements(self, scene_text: str, max_length: int = 100) -> str:
         """
         Extract key visual elements from scene text
@@ -125,16 +137,14 @@ class PromptBuilder:
             Condensed visual description
         """
         # Remove dialogue (text in quotes)
-        import re
-        no_dialogue = re.sub(r'"[^"]*"', '', scene_text)
-        no_dialogue = re.sub(r'"[^"]*"', '', no_dialogue)
+        no_dialogue = _DIALOGUE_RE.sub('', scene_text)
         
         # Clean up
         no_dialogue = no_dialogue.strip()
         
         # If still too long, take first sentence or truncate
         if len(no_dialogue) > max_length:
-            sentences = re.split(r'(?<=[.!?])\s+', no_dialogue)
+            sentences = _SENT_SPLIT_RE.split(no_dialogue)
             if sentences:
                 no_dialogue = sentences[0]
             
@@ -159,15 +169,33 @@ class PromptBuilder:
         Args:
             scenes: List of Scene objects
             character: Main character profile
+            use_ai: Use AI for prompt enhancement
             
         Returns:
             List of (positive_prompt, negative_prompt) tuples
         """
+        negative = self.get_negative_prompt()
+        
+        # Enhance every scene in one batched AI call instead of one per scene
+        if use_ai and character and scenes:
+            try:
+                from ai_helper import ai_helper
+                
+                if ai_helper.is_available():
+                    char_desc = character.get_description()
+                    enhanced = ai_helper.enhance_prompts(
+                        self.base_style,
+                        [scene.text for scene in scenes]
+                    )
+                    print(f"[OK] AI enhanced prompts for {len(scenes)} scenes")
+                    return [(self._finish_enhanced(e, char_desc), negative) for e in enhanced]
+            except Exception as e:
+                print(f"⚠ Batch prompt enhancement failed, enhancing per scene: {e}")
+        
         prompts = []
         
         for scene in scenes:
             positive = self.build_prompt(scene, character, use_ai=use_ai)
-            negative = self.get_negative_prompt()
             prompts.append((positive, negative))
         
         return prompts
@@ -195,9 +223,9 @@ if __name__ == "__main__":
     
     # Create a character
     char = CharacterProfile("Elena")
-    char.hair = "long silver hair"
-    char.eyes = "bright blue eyes"
-    char.outfit = "elegant black combat armor"
+    char.hair_color = "long silver"
+    char.eye_color = "bright blue"
+    char.default_outfit = "elegant black combat armor"
     
     # Build prompt
     builder = PromptBuilder()
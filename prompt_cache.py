@@ -0,0 +1,101 @@
+"""
+Persistent cache for LLM-derived generation inputs (prompts, character info)
+
+Re-submitting the same chapter with the same settings is common while
+iterating in the UI; this keeps those runs from paying for the AI calls again.
+"""
+import hashlib
+import json
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from config import CACHE_DIR
+
+PROMPT_CACHE_TTL = 30 * 24 * 3600  # 30 days
+PROMPT_CACHE_MAX_ENTRIES = 2000
+
+
+def cache_key(*parts: Any) -> str:
+    """Build a stable key from strings and JSON-serializable settings"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True, default=str)
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class PromptCache:
+    """SQLite-backed key/value cache with a TTL and LRU eviction"""
+
+    def __init__(
+        self,
+        db_path: Path = CACHE_DIR / "prompts.sqlite",
+        ttl: int = PROMPT_CACHE_TTL,
+        max_entries: int = PROMPT_CACHE_MAX_ENTRIES
+    ):
+        self.db_path = Path(db_path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB, created_at INT, accessed_at INT)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Generation runs on worker threads, so connect per operation
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None on miss/expiry"""
+        now = int(time.time())
+        try:
+            with self._lock, self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                value, created_at = row
+                if now - created_at > self.ttl:
+                    conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    return None
+
+                conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return pickle.loads(value)
+        except (sqlite3.Error, pickle.UnpicklingError) as e:
+            print(f"⚠ Prompt cache read failed: {e}")
+            return None
+
+    def set(self, key: str, value: Any):
+        """Store a value, evicting expired and least recently used entries"""
+        now = int(time.time())
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, pickle.dumps(value), now, now)
+                )
+                conn.execute("DELETE FROM cache WHERE created_at < ?", (now - self.ttl,))
+                conn.execute(
+                    "DELETE FROM cache WHERE key NOT IN ("
+                    "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+        except sqlite3.Error as e:
+            print(f"⚠ Prompt cache write failed: {e}")
+
+
+# Global instance
+prompt_cache = PromptCache()
@@ -1,10 +1,14 @@
 """
 Style presets and customization system
 """
+import sys
 from typing import Dict, List
 from dataclasses import dataclass
 
-@dataclass
+# No per-instance __dict__ where dataclass supports it (3.10+)
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(frozen=True, **_SLOTS)
 class StylePreset:
     """Art style configuration"""
     name: str
@@ -111,6 +115,12 @@ STYLE_PRESETS = {
     )
 }
 
+# (prompt prefix, negative prompt, cfg, steps) per style, for apply_style_to_prompt
+_STYLE_FAST = {
+    name: (f"{p.base_prompt}, ", p.negative_prompt, p.cfg_scale, p.steps)
+    for name, p in STYLE_PRESETS.items()
+}
+
 
 class StyleManager:
     """Manage and apply style presets"""
@@ -118,6 +128,7 @@ class StyleManager:
     def __init__(self):
         self.presets = STYLE_PRESETS
         self.current_style = "manhwa"
+        self._mixes: Dict[tuple, StylePreset] = {}
     
     def get_style(self, style_name: str) -> StylePreset:
         """Get a style preset by name"""
@@ -142,17 +153,35 @@ class StyleManager:
         Returns:
             (enhanced_prompt, negative_prompt, cfg_scale, steps)
         """
-        style = self.get_style(style_name)
+        prefix, negative, cfg_scale, steps = _STYLE_FAST.get(style_name, _STYLE_FAST["manhwa"])
         
         # Combine style base with scene
-        enhanced = f"{style.base_prompt}, {base_scene_prompt}"
+        return (prefix + base_scene_prompt, negative, cfg_scale, steps)
+    
+    def prefix_for(self, style_name: str) -> str:
+        """Style text shared by every scene prompt in this style"""
+        return self.get_style(style_name).base_prompt
+    
+    def negative_for(self, style_name: str) -> str:
+        """Negative prompt shared by every scene in this style"""
+        return self.get_style(style_name).negative_prompt
+    
+    def batch_apply_style_to_prompts(
+        self,
+        scene_prompts: List[str],
+        style_name: str = "manhwa"
+    ) -> tuple:
+        """
+        Apply one style to many scene prompts
         
-        return (
-            enhanced,
-            style.negative_prompt,
-            style.cfg_scale,
-            style.steps
-        )
+        All scenes share one negative prompt, which the generator encodes
+        once and reuses (ManhwaGenerator._encode_negative).
+        
+        Returns:
+            ([enhanced_prompt, ...], negative_prompt, cfg_scale, steps)
+        """
+        prefix, negative, cfg_scale, steps = _STYLE_FAST.get(style_name, _STYLE_FAST["manhwa"])
+        return ([prefix + p for p in scene_prompts], negative, cfg_scale, steps)
     
     def mix_styles(
         self, 
@@ -171,6 +200,10 @@ class StyleManager:
         Returns:
             Mixed StylePreset
         """
+        key = (style1, style2, ratio)
+        if key in self._mixes:
+            return self._mixes[key]
+        
         s1 = self.get_style(style1)
         s2 = self.get_style(style2)
         
@@ -182,7 +215,7 @@ class StyleManager:
         mixed_cfg = s1.cfg_scale * (1 - ratio) + s2.cfg_scale * ratio
         mixed_steps = int(s1.steps * (1 - ratio) + s2.steps * ratio)
         
-        return StylePreset(
+        mixed = self._mixes[key] = StylePreset(
             name=f"{s1.name}/{s2.name} Mix",
             description=f"Blend of {s1.name} and {s2.name}",
             base_prompt=mixed_prompt,
@@ -192,6 +225,7 @@ class StyleManager:
             cfg_scale=mixed_cfg,
             steps=mixed_steps
         )
+        return mixed
 
 
 # Global instance
@@ -2,13 +2,53 @@
 Chapter text processing and intelligent scene splitting
 """
 import re
-from typing import List, Dict, Tuple
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
+from typing import List, Dict, Tuple, Iterator, Optional
 from pathlib import Path
 from config import SCENE_MARKERS, MIN_SCENE_LENGTH, MAX_SCENE_LENGTH
 
+# All scene markers in one pass (same boundaries as splitting on each in turn)
+_MARKER_RE = re.compile('|'.join(re.escape(m) for m in SCENE_MARKERS))
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Scene mood keywords, in priority order (first mood with a hit wins)
+_MOOD_KEYWORDS = {
+    "tense": ["danger", "fear", "tension", "threat", "dark"],
+    "peaceful": ["calm", "gentle", "serene", "quiet", "peaceful"],
+    "exciting": ["excitement", "thrilling", "amazing", "wonderful"],
+    "sad": ["tear", "cry", "sorrow", "sad", "grief"],
+    "angry": ["anger", "rage", "furious", "mad", "shouted"]
+}
+_MOOD_ORDER = list(_MOOD_KEYWORDS)
+# One bit per mood, lowest bit = highest priority
+_KEYWORD_BIT = {
+    kw: 1 << rank for rank, mood in enumerate(_MOOD_ORDER) for kw in _MOOD_KEYWORDS[mood]
+}
+
+# One scan per scene for every keyword; the lookahead reports a match at each
+# position, so overlapping keywords are all seen, as with substring tests
+_MOOD_KEYWORD_RE = re.compile(
+    '(?=(' + '|'.join(sorted(_KEYWORD_BIT, key=len, reverse=True)) + '))'
+)
+_ACTION_VERB_RE = re.compile('rush|run|fight|jump|strike|dodge')
+_DIALOGUE_RE = re.compile('"|said')
+
+
+@lru_cache(maxsize=8)
+def _clean(raw_text: str) -> str:
+    # Collapsing every whitespace run (newlines included) to one space also
+    # covers line-ending normalization and blank-line squeezing
+    return _WHITESPACE_RE.sub(' ', raw_text).strip()
+
+
 class Scene:
     """Represents a single visual scene/panel"""
     
+    # Long chapters make thousands of these; no per-instance __dict__
+    __slots__ = ('text', 'index', 'characters', 'location', 'mood', 'action_type')
+    
     def __init__(self, text: str, index: int):
         self.text = text.strip()
         self.index = index
@@ -22,26 +62,20 @@ class Scene:
         text_lower = self.text.lower()
         
         # Detect action vs dialogue
-        if '"' in self.text or '"' in self.text or "said" in text_lower:
+        if '"' in self.text or "said" in text_lower:
             self.action_type = "dialogue"
-        elif any(verb in text_lower for verb in ["rush", "run", "fight", "jump", "strike", "dodge"]):
+        elif _ACTION_VERB_RE.search(text_lower):
             self.action_type = "action"
         else:
             self.action_type = "description"
         
         # Detect mood
-        mood_keywords = {
-            "tense": ["danger", "fear", "tension", "threat", "dark"],
-            "peaceful": ["calm", "gentle", "serene", "quiet", "peaceful"],
-            "exciting": ["excitement", "thrilling", "amazing", "wonderful"],
-            "sad": ["tear", "cry", "sorrow", "sad", "grief"],
-            "angry": ["anger", "rage", "furious", "mad", "shouted"]
-        }
-        
-        for mood, keywords in mood_keywords.items():
-            if any(kw in text_lower for kw in keywords):
-                self.mood = mood
-                break
+        mask = 0
+        for kw in _MOOD_KEYWORD_RE.findall(text_lower):
+            mask |= _KEYWORD_BIT[kw]
+        if mask:
+            # Lowest set bit is the first mood (in priority order) with a hit
+            self.mood = _MOOD_ORDER[(mask & -mask).bit_length() - 1]
         
         return self
     
@@ -60,12 +94,66 @@ class Scene:
         return f"Scene {self.index} ({self.action_type}, {self.mood}): {self.text[:50]}..."
 
 
+class SceneTable:
+    """
+    Scene texts and tags stored column-wise
+    
+    Tags every scene with one regex pass per pattern over the whole
+    (NUL-joined) chapter instead of a pass per scene; gives the same
+    tags as Scene.analyze.
+    """
+    
+    __slots__ = ('texts', 'moods', 'action_types')
+    
+    def __init__(self, texts: List[str]):
+        self.texts = [t.strip() for t in texts]
+        n = len(self.texts)
+        
+        lowered = [t.lower() for t in self.texts]
+        joined = "\0".join(lowered)
+        starts = list(accumulate((len(t) + 1 for t in lowered[:-1]), initial=0))
+        
+        def owners(pattern):
+            return (bisect_right(starts, m.start()) - 1 for m in pattern.finditer(joined))
+        
+        masks = [0] * n
+        for m in _MOOD_KEYWORD_RE.finditer(joined):
+            masks[bisect_right(starts, m.start()) - 1] |= _KEYWORD_BIT[m.group(1)]
+        dialogue = set(owners(_DIALOGUE_RE))
+        action = set(owners(_ACTION_VERB_RE))
+        
+        self.moods = [
+            _MOOD_ORDER[(mask & -mask).bit_length() - 1] if mask else "neutral"
+            for mask in masks
+        ]
+        self.action_types = [
+            "dialogue" if i in dialogue else "action" if i in action else "description"
+            for i in range(n)
+        ]
+    
+    def __len__(self):
+        return len(self.texts)
+    
+    def to_scenes(self) -> List[Scene]:
+        """Materialize Scene objects (1-based indices)"""
+        scenes = []
+        for idx, (text, mood, action_type) in enumerate(
+            zip(self.texts, self.moods, self.action_types)
+        ):
+            scene = Scene(text, idx + 1)
+            scene.mood = mood
+            scene.action_type = action_type
+            scenes.append(scene)
+        return scenes
+
+
 class ChapterParser:
     """Parse and split chapter text into visual scenes"""
     
     def __init__(self):
         self.raw_text = ""
         self.scenes: List[Scene] = []
+        self._split_key = None  # (raw_text, use_ai) that produced self.scenes
     
     def load_from_file(self, filepath: str) -> str:
         """
@@ -92,20 +180,8 @@ class ChapterParser:
         print(f"[OK] Loaded chapter: {len(self.raw_text)} characters")
     
     def clean_text(self) -> str:
-        """Clean and normalize chapter text"""
-        text = self.raw_text
-        
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Fix common issues
-        text = text.replace('\r\n', '\n')
-        text = text.replace('\r', '\n')
-        
-        # Remove multiple consecutive newlines (keep paragraph breaks)
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        
-        return text.strip()
+        """Clean and normalize chapter text (cached per distinct text)"""
+        return _clean(self.raw_text)
     
     def split_scenes(self, use_ai: bool = True) -> List[Scene]:
         """
@@ -122,8 +198,39 @@ class ChapterParser:
             use_ai: Use AI helper for smart scene detection
         
         Returns:
-            List of Scene objects
+            List of Scene objects (reused until different text is loaded)
+        """
+        key = (self.raw_text, use_ai)
+        if self.scenes and self._split_key == key:
+            return self.scenes
+        
+        self.scenes = list(self.iter_scenes(use_ai=use_ai))
+        self._split_key = key
+        print(f"[OK] Split into {len(self.scenes)} scenes")
+        return self.scenes
+    
+    def iter_scenes(
+        self,
+        text: Optional[str] = None,
+        limit: Optional[int] = None,
+        use_ai: bool = True
+    ) -> Iterator[Scene]:
         """
+        Yield scenes one at a time, stopping after `limit`
+        
+        Same scenes as split_scenes(), but the rule-based path only splits,
+        merges and analyzes as much of the chapter as it needs.
+        
+        Args:
+            text: Chapter text (default: the loaded chapter)
+            limit: Maximum number of scenes to yield
+            use_ai: Use AI helper for smart scene detection
+        """
+        if text is not None:
+            self.load_from_string(text)
+        if limit is not None and limit <= 0:
+            return
+        
         # Try AI helper first
         if use_ai:
             try:
@@ -131,80 +238,79 @@ class ChapterParser:
                 
                 if ai_helper.is_available():
                     print("Using AI helper for scene detection...")
-                    scenes_data = ai_helper.analyze_chapter_scenes(self.raw_text)
+                    if limit:
+                        scenes_data = ai_helper.analyze_chapter_scenes(self.raw_text, max_scenes=limit)
+                    else:
+                        scenes_data = ai_helper.analyze_chapter_scenes(self.raw_text)
                     
                     if scenes_data:
-                        self.scenes = []
-                        for idx, scene_dict in enumerate(scenes_data):
+                        print(f"[OK] AI detected {len(scenes_data)} scenes")
+                        for idx, scene_dict in enumerate(scenes_data[:limit]):
                             scene = Scene(scene_dict.get('text', ''), idx + 1)
                             scene.mood = scene_dict.get('mood', 'neutral')
                             scene.action_type = 'action' if scene_dict.get('action_level') == 'high' else 'description'
-                            self.scenes.append(scene)
-                        
-                        print(f"[OK] AI detected {len(self.scenes)} scenes")
-                        return self.scenes
+                            yield scene
+                        return
             except Exception as e:
                 print(f"⚠ AI scene detection failed, using fallback: {e}")
         
         # Fallback to rule-based splitting
         print("Using rule-based scene detection...")
-        text = self.clean_text()
+        if limit is None:
+            # Whole chapter wanted: tag every scene in one pass
+            yield from SceneTable(list(self._iter_scene_texts(self.clean_text()))).to_scenes()
+            return
         
+        for idx, scene_text in enumerate(self._iter_scene_texts(self.clean_text())):
+            if limit is not None and idx >= limit:
+                return
+            yield Scene(scene_text, idx + 1).analyze()
+    
+    def _iter_scene_texts(self, text: str) -> Iterator[str]:
+        """Split by markers, merge small fragments and split long ones, lazily"""
         # First pass: split by markers
-        segments = [text]
-        for marker in SCENE_MARKERS:
-            new_segments = []
-            for seg in segments:
-                parts = seg.split(marker)
-                new_segments.extend([p.strip() for p in parts if p.strip()])
-            segments = new_segments
+        segments = (seg.strip() for seg in _MARKER_RE.split(text))
         
-        # Second pass: merge small scenes and split large ones
-        merged_scenes = []
-        current_buffer = ""
+        # Second pass: merge small scenes and split large ones. Each segment
+        # is split into words once; scenes are built from word lists and
+        # joined once.
+        buffer = []  # words of the pending (too short) scene
         
         for segment in segments:
-            word_count = len(segment.split())
+            if not segment:
+                continue
+            words = segment.split()
+            word_count = len(words)
             
             # If segment is too short, buffer it
             if word_count < MIN_SCENE_LENGTH:
-                current_buffer += " " + segment
+                buffer += words
                 continue
             
             # Add buffered content if any
-            if current_buffer:
-                segment = current_buffer.strip() + " " + segment
-                current_buffer = ""
+            if buffer:
+                words = buffer + words
+                buffer = []
             
-            # If segment is too long, split it
+            # If segment is too long, split it at sentence ends (words ending
+            # in . ! or ?) once a scene has enough words
             if word_count > MAX_SCENE_LENGTH:
-                sentences = re.split(r'(?<=[.!?])\s+', segment)
-                temp_scene = ""
+                scene = []
+                last = len(words) - 1
                 
-                for sent in sentences:
-                    temp_scene += sent + " "
-                    if len(temp_scene.split()) >= MIN_SCENE_LENGTH:
-                        merged_scenes.append(temp_scene.strip())
-                        temp_scene = ""
+                for i, word in enumerate(words):
+                    scene.append(word)
+                    if (i == last or word[-1] in '.!?') and len(scene) >= MIN_SCENE_LENGTH:
+                        yield " ".join(scene)
+                        scene = []
                 
-                if temp_scene:
-                    current_buffer = temp_scene
+                buffer = scene
             else:
-                merged_scenes.append(segment)
+                yield " ".join(words)
         
         # Add any remaining buffer
-        if current_buffer:
-            merged_scenes.append(current_buffer.strip())
-        
-        # Create Scene objects and analyze
-        self.scenes = []
-        for idx, scene_text in enumerate(merged_scenes):
-            scene = Scene(scene_text, idx + 1)
-            scene.analyze()
-            self.scenes.append(scene)
-        
-        print(f"[OK] Split into {len(self.scenes)} scenes")
-        return self.scenes
+        if buffer:
+            yield " ".join(buffer)
     
     def get_scenes(self) -> List[Scene]:
         """Get all scenes"""
@@ -212,16 +318,23 @@ class ChapterParser:
     
     def save_scenes(self, filepath: str):
         """Save scene breakdown to file"""
+        divider = "-" * 80
+        parts = [
+            "CHAPTER SCENE BREAKDOWN\n",
+            f"Total scenes: {len(self.scenes)}\n",
+            "=" * 80 + "\n\n"
+        ]
+        parts.extend(
+            f"SCENE {scene.index}\n"
+            f"Type: {scene.action_type} | Mood: {scene.mood}\n"
+            f"Text: {scene.text}\n"
+            f"{divider}\n\n"
+            for scene in self.scenes
+        )
+        
+        # One write of the whole breakdown instead of four per scene
         with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(f"CHAPTER SCENE BREAKDOWN\n")
-            f.write(f"Total scenes: {len(self.scenes)}\n")
-            f.write("=" * 80 + "\n\n")
-            
-            for scene in self.scenes:
-                f.write(f"SCENE {scene.index}\n")
-                f.write(f"Type: {scene.action_type} | Mood: {scene.mood}\n")
-                f.write(f"Text: {scene.text}\n")
-                f.write("-" * 80 + "\n\n")
+            f.write("".join(parts))
         
         print(f"[OK] Saved scene breakdown: {filepath}")
     
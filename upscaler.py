@@ -4,16 +4,98 @@ Image upscaling and enhancement utilities
 from PIL import Image
 import numpy as np
 from pathlib import Path
-from typing import Tuple
+from typing import Tuple, List, Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+import importlib.util
+import os
 
-try:
-    import cv2
-    CV2_AVAILABLE = True
-except ImportError:
-    CV2_AVAILABLE = False
+# cv2 takes a noticeable time to import, so only check that it's installed
+# here and import it on first use
+CV2_AVAILABLE = importlib.util.find_spec("cv2") is not None
+if not CV2_AVAILABLE:
     print("⚠ OpenCV not available - some upscaling features disabled")
 
 
+@lru_cache(maxsize=None)
+def _cv2():
+    import cv2  # Lazy import
+    return cv2
+
+# PIL's SMOOTH filter, the degenerate image ImageEnhance.Sharpness blends against
+_SMOOTH_KERNEL = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=np.float32) / 13
+# ITU-R 601-2 luma, as used by PIL's RGB -> L conversion
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def _enhance_array(
+    pixels: np.ndarray,
+    sharpness: float = 1.0,
+    brightness: float = 1.0,
+    contrast: float = 1.0,
+    saturation: float = 1.0
+) -> np.ndarray:
+    """
+    Sharpness, brightness, contrast and saturation in one float buffer
+    
+    Same blends as chaining PIL's ImageEnhance classes in that order, but
+    without an 8-bit image (and full pixel pass) per step. Takes and
+    returns HxWx3 uint8 RGB; every step after the float copy is in place.
+    """
+    out = pixels.astype(np.float32)
+    
+    if sharpness != 1.0:
+        if CV2_AVAILABLE:
+            smooth = _cv2().filter2D(out, -1, _SMOOTH_KERNEL)
+        else:
+            # SMOOTH is a 3x3 box plus 4x the centre: separable row/column
+            # sums instead of nine weighted shifted copies
+            padded = np.pad(out, ((1, 1), (1, 1), (0, 0)), mode='edge')
+            rows = padded[:, :-2] + padded[:, 1:-1] + padded[:, 2:]
+            smooth = rows[:-2] + rows[1:-1] + rows[2:]
+            del padded, rows
+            smooth += 4 * out
+            smooth /= 13
+        # PIL leaves the 1px border unfiltered
+        smooth[[0, -1], :] = out[[0, -1], :]
+        smooth[:, [0, -1]] = out[:, [0, -1]]
+        out -= smooth
+        out *= sharpness
+        out += smooth
+        del smooth
+    
+    if brightness != 1.0:
+        out *= brightness
+    
+    if contrast != 1.0:
+        mean = float((np.clip(out, 0, 255) @ _LUMA).mean())
+        out -= mean
+        out *= contrast
+        out += mean
+    
+    if saturation != 1.0:
+        gray = (out @ _LUMA)[..., None]
+        out -= gray
+        out *= saturation
+        out += gray
+    
+    out += 0.5
+    np.clip(out, 0, 255, out=out)
+    return out.astype(np.uint8)
+
+
+def _enhance_rgb(image: Image.Image, *factors: float) -> Image.Image:
+    """_enhance_array for a PIL RGB image"""
+    return Image.fromarray(_enhance_array(np.asarray(image), *factors))
+
+
+@lru_cache(maxsize=32)
+def _linear_lut(gain: float, pivot: int, color_bands: int, alpha: bool) -> List[int]:
+    """Image.point table for v -> pivot + gain * (v - pivot), alpha untouched"""
+    ramp = [min(255, max(0, int(pivot + gain * (v - pivot) + 0.5))) for v in range(256)]
+    return ramp * color_bands + (list(range(256)) if alpha else [])
+
+
 class ImageUpscaler:
     """Upscale and enhance generated panels"""
     
@@ -23,7 +105,8 @@ class ImageUpscaler:
     def upscale_simple(
         self, 
         image: Image.Image, 
-        scale: int = 2
+        scale: int = 2,
+        resample: Optional[int] = None
     ) -> Image.Image:
         """
         Simple high-quality upscaling using Lanczos resampling
@@ -31,12 +114,20 @@ class ImageUpscaler:
         Args:
             image: PIL Image
             scale: Upscale factor (2x, 4x, etc.)
+            resample: PIL filter (default: Lanczos, bicubic from 4x up where
+                the difference is lost after sharpening)
             
         Returns:
             Upscaled PIL Image
         """
+        if scale == 1:
+            return image
+        
+        if resample is None:
+            resample = Image.Resampling.BICUBIC if scale >= 4 else Image.Resampling.LANCZOS
+        
         new_size = (image.width * scale, image.height * scale)
-        upscaled = image.resize(new_size, Image.Resampling.LANCZOS)
+        upscaled = image.resize(new_size, resample)
         return upscaled
     
     def upscale_opencv(
@@ -50,15 +141,13 @@ class ImageUpscaler:
         
         Methods: nearest, bilinear, bicubic, lanczos
         """
-        if not self.cv2_available:
+        if not self.cv2_available or scale == 1:
             return self.upscale_simple(image, scale)
         
-        # Convert PIL to numpy
-        img_array = np.array(image)
-        
-        # Convert RGB to BGR for OpenCV
-        if len(img_array.shape) == 3:
-            img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+        # View PIL's pixels as numpy (no copy). Resizing is per-channel, so
+        # the RGB/BGR swap OpenCV usually wants would be two wasted passes.
+        img_array = np.asarray(image)
+        cv2 = _cv2()
         
         # Choose interpolation method
         interpolation = {
@@ -74,10 +163,6 @@ class ImageUpscaler:
         # Upscale
         upscaled = cv2.resize(img_array, new_size, interpolation=interpolation)
         
-        # Convert back to RGB
-        if len(upscaled.shape) == 3:
-            upscaled = cv2.cvtColor(upscaled, cv2.COLOR_BGR2RGB)
-        
         # Convert to PIL
         return Image.fromarray(upscaled)
     
@@ -89,6 +174,9 @@ class ImageUpscaler:
             image: PIL Image
             amount: Sharpening strength (1.0-3.0)
         """
+        if image.mode == 'RGB':
+            return _enhance_rgb(image, amount)
+        
         from PIL import ImageEnhance
         
         enhancer = ImageEnhance.Sharpness(image)
@@ -104,20 +192,36 @@ class ImageUpscaler:
         """
         Enhance image quality with multiple adjustments
         """
-        from PIL import ImageEnhance
+        if image.mode == 'RGB':
+            return _enhance_rgb(image, 1.0, brightness, contrast, saturation)
         
-        # Brightness
-        if brightness != 1.0:
-            enhancer = ImageEnhance.Brightness(image)
-            image = enhancer.enhance(brightness)
+        from PIL import ImageEnhance, ImageStat
         
-        # Contrast
-        if contrast != 1.0:
-            enhancer = ImageEnhance.Contrast(image)
-            image = enhancer.enhance(contrast)
+        # Brightness and contrast are per-value maps: apply them as cached
+        # lookup tables instead of building an enhancer (and blend) per call
+        if image.mode in ('L', 'RGBA'):
+            color_bands = 1 if image.mode == 'L' else 3
+            alpha = image.mode == 'RGBA'
+            
+            if brightness != 1.0:
+                image = image.point(_linear_lut(brightness, 0, color_bands, alpha))
+            
+            if contrast != 1.0:
+                mean = int(ImageStat.Stat(image.convert('L')).mean[0] + 0.5)
+                image = image.point(_linear_lut(contrast, mean, color_bands, alpha))
+        else:
+            # Brightness
+            if brightness != 1.0:
+                enhancer = ImageEnhance.Brightness(image)
+                image = enhancer.enhance(brightness)
+            
+            # Contrast
+            if contrast != 1.0:
+                enhancer = ImageEnhance.Contrast(image)
+                image = enhancer.enhance(contrast)
         
-        # Color saturation
-        if saturation != 1.0:
+        # Color saturation (no-op for greyscale)
+        if saturation != 1.0 and image.mode != 'L':
             enhancer = ImageEnhance.Color(image)
             image = enhancer.enhance(saturation)
         
@@ -133,12 +237,34 @@ class ImageUpscaler:
         """
         Complete upscaling and enhancement pipeline
         """
+        factors = (
+            1.3 if sharpen else 1.0,  # sharpness
+            1.0,                      # brightness
+            1.1 if enhance else 1.0,  # contrast
+            1.05 if enhance else 1.0  # saturation
+        )
+        
+        # RGB panels stay one numpy array from resize to the final image
+        if self.cv2_available and image.mode == 'RGB' and (sharpen or enhance):
+            pixels = np.asarray(image)
+            if scale != 1:
+                cv2 = _cv2()
+                pixels = cv2.resize(
+                    pixels, (image.width * scale, image.height * scale),
+                    interpolation=cv2.INTER_LANCZOS4
+                )
+            return Image.fromarray(_enhance_array(pixels, *factors))
+        
         # Upscale
         if self.cv2_available:
             upscaled = self.upscale_opencv(image, scale, "lanczos")
         else:
             upscaled = self.upscale_simple(image, scale)
         
+        # Sharpen + enhance fused into one pass for RGB panels
+        if upscaled.mode == 'RGB' and (sharpen or enhance):
+            return _enhance_rgb(upscaled, *factors)
+        
         # Sharpen
         if sharpen:
             upscaled = self.sharpen(upscaled, 1.3)
@@ -171,18 +297,72 @@ class ImageUpscaler:
         images = list(input_dir.glob(pattern))
         print(f"Upscaling {len(images)} images...")
         
-        for img_path in images:
+        def process(img_path: Path):
             print(f"  Processing {img_path.name}...")
             
-            img = Image.open(img_path)
-            upscaled = self.upscale_and_enhance(img, scale)
+            with Image.open(img_path) as img:
+                # Let libjpeg decode straight to RGB instead of YCbCr + convert
+                if img.format == 'JPEG':
+                    img.draft('RGB', img.size)
+                upscaled = self.upscale_and_enhance(img.convert("RGB"), scale)
             
+            # optimize=True's exhaustive zlib search dominated the save
             output_path = output_dir / img_path.name
-            upscaled.save(output_path, "PNG", optimize=True)
+            upscaled.save(output_path, "PNG", optimize=False, compress_level=3)
+        
+        # Decode, resize, enhance and encode all release the GIL, so
+        # threads overlap one image's I/O with another's pixel work
+        if images:
+            with ThreadPoolExecutor(max_workers=min(len(images), os.cpu_count() or 1)) as pool:
+                list(pool.map(process, images))
         
         print(f"✓ Done! Saved to {output_dir}")
 
 
+def _upscale_file(path: str, scale: int) -> str:
+    """
+    Upscale one panel file in place (thread pool worker)
+    
+    Loads and saves inside the worker so decode/encode run in parallel too;
+    the save goes through a temp file + os.replace.
+    """
+    path = Path(path)
+    with Image.open(path) as img:
+        upscaled = ImageUpscaler().upscale_and_enhance(img, scale)
+    
+    tmp_path = path.with_name(path.name + '.tmp')
+    upscaled.save(tmp_path, "PNG", optimize=False, compress_level=3)
+    os.replace(tmp_path, path)
+    return str(path)
+
+
+def upscale_files(
+    paths: List[Path],
+    scale: int = 2,
+    workers: Optional[int] = None
+) -> Iterator[Path]:
+    """
+    Upscale panel files in place across a thread pool
+    
+    Panels are independent, and PIL's resize/filter, the numpy/cv2
+    enhancement and the PNG encode all release the GIL, so threads scale.
+    (A process pool would fork the app's generation worker after torch/CUDA
+    and its background threads are up, which can deadlock the children.)
+    
+    Yields:
+        Each path as soon as it has been replaced
+    """
+    paths = [Path(p) for p in paths]
+    if not paths:
+        return
+    
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_upscale_file, str(p), scale) for p in paths]
+        for future in as_completed(futures):
+            yield Path(future.result())
+
+
 # Global instance
 upscaler = ImageUpscaler()
 